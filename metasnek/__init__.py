@@ -3,4 +3,14 @@
 Modules exported by this package:
 
 - `fastq_finder`: Functions for finding and parsing fasta/q files from a directory or TSV
+- `manifest`: Compiled binary sample/fasta manifests with lazy mmap lookups
+- `delta`: Change lists between sample sets for rerunning only changed samples
+- `aio`: Asyncio sample and fasta discovery with bounded concurrency
+- `sketch`: Parallel MinHash sketching and similarity of samples and genomes
+- `subsample`: Paired-aware streaming subsampling of samples
+- `sniff`: Quick parallel format and truncation checks of discovered files
+- `shared_samples`: Samples tables published in shared memory for worker processes
+- `cli`: The `metasnek` command line interface
+- `seqio`: Compression-aware reading of sequence files with background decompression
+- `bgzf`: Multithreaded block-gzip (BGZF) writer for sequence output
 """
@@ -0,0 +1,6 @@
+import sys
+
+from metasnek.cli import main
+
+
+sys.exit(main())
@@ -0,0 +1,206 @@
+"""Asyncio counterparts of the sample and fasta discovery functions
+
+Blocking stat/listdir/read calls run in a bounded thread pool, and a semaphore caps how
+many of them are in flight across every directory being scanned, so many projects can be
+scanned concurrently without blocking the event loop. Results and errors match the sync API.
+"""
+import os
+import csv
+import glob
+import asyncio
+import concurrent.futures
+
+from metasnek import fastq_finder, fasta_finder
+
+
+class AsyncScanner:
+    """Scan reads directories, samples TSVs and fasta inputs from asyncio code
+
+    Args:
+        max_workers (int): threads in the executor running blocking filesystem calls
+        max_concurrency (int): global limit of blocking calls in flight (default: max_workers)
+    """
+
+    def __init__(self, max_workers=8, max_concurrency=None):
+        self.max_workers = max_workers
+        self.max_concurrency = max_concurrency or max_workers
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Shut down the executor
+
+        Returns:
+            None
+        """
+
+        self._executor.shutdown(wait=False)
+
+    async def _run(self, func, *args):
+        """Run a blocking call in the executor, within the global concurrency limit"""
+
+        if self._semaphore is None:
+            # created lazily so it belongs to the running event loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+
+    async def _isfile_map(self, filepaths):
+        """Check many filepaths concurrently, returning a dictionary of filepath: exists"""
+
+        filepaths = list(dict.fromkeys(filepaths))
+        results = await asyncio.gather(
+            *(self._run(os.path.isfile, filepath) for filepath in filepaths)
+        )
+        return dict(zip(filepaths, results))
+
+    async def parse_tsv_file(self, file_path):
+        """Async fastq_finder.parse_tsv_file(), checking the reads files concurrently
+
+        Args:
+            file_path (str): Path to the TSV file.
+
+        Returns:
+            tuple: A tuple containing two sets, see fastq_finder.parse_tsv_file()
+        """
+
+        def read_rows():
+            with open(file_path, "r") as tsv_file:
+                return [
+                    fastq_finder._parse_tsv_row(row)
+                    for row in csv.reader(tsv_file, delimiter="\t")
+                ]
+
+        rows = await self._run(read_rows)
+        existing = await self._isfile_map(
+            filepath for row in rows for filepath in row[1:] if filepath
+        )
+
+        paired_reads = set()
+        unpaired_reads = set()
+        for sample_name, r1_file, r2_file, s_file in rows:
+            fastq_finder._check_tsv_reads(
+                r1_file,
+                r2_file,
+                s_file,
+                isfile=lambda filepath: existing.get(filepath, False),
+            )
+            if r2_file:
+                paired_reads.add((sample_name, r1_file, r2_file, s_file))
+            else:
+                unpaired_reads.add((sample_name, r1_file))
+
+        return paired_reads, unpaired_reads
+
+    async def parse_samples(self, input_file_or_directory):
+        """Async fastq_finder.parse_samples()
+
+        Args:
+            input_file_or_directory (str): filepath for TSV file or directory of reads
+
+        Returns:
+            tuple: A tuple containing two sets, see fastq_finder.parse_samples()
+        """
+
+        if await self._run(os.path.isdir, input_file_or_directory):
+            file_list = await self._run(
+                glob.glob, os.path.join(input_file_or_directory, "*")
+            )
+            paired_files, unpaired_files = await self._run(
+                fastq_finder.parse_directory, file_list
+            )
+        elif await self._run(os.path.isfile, input_file_or_directory):
+            try:
+                paired_files, unpaired_files = await self.parse_tsv_file(
+                    input_file_or_directory
+                )
+            except FileNotFoundError as e:
+                raise ValueError(
+                    "Parse_samples failed with error from parse_tsv_file: " + str(e)
+                )
+        else:
+            raise ValueError(
+                f"{input_file_or_directory} is neither a file nor directory"
+            )
+
+        if len(paired_files) == 0 and len(unpaired_files) == 0:
+            raise ValueError(
+                f"Failed to detect any reads files and samples for {input_file_or_directory}"
+            )
+
+        return paired_files, unpaired_files
+
+    async def parse_samples_to_dictionary(self, input_file_or_directory):
+        """Async fastq_finder.parse_samples_to_dictionary()
+
+        Args:
+            input_file_or_directory (str): filepath of samples TSV or directory
+
+        Returns:
+            dict: samples dictionary, see fastq_finder.parse_samples_to_dictionary()
+        """
+
+        paired, unpaired = await self.parse_samples(input_file_or_directory)
+        return fastq_finder.convert_to_dictionary(paired, unpaired)
+
+    async def parse_fastas(self, file_or_directory):
+        """Async fasta_finder.parse_fastas()
+
+        Args:
+            file_or_directory (str): filepath for fasta, TSV file, or directory of FASTA files
+
+        Returns:
+            fasta_files (dict): see fasta_finder.parse_fastas()
+        """
+
+        if await self._run(os.path.isfile, file_or_directory):
+            return await self._run(fasta_finder.parse_fastas, file_or_directory)
+        if await self._run(os.path.isdir, file_or_directory):
+            return await self._run(
+                fasta_finder.fastas_from_directory, file_or_directory
+            )
+        print(f"Input not recognized: {file_or_directory}")
+        return {}
+
+    async def scan_samples(self, inputs, return_exceptions=False):
+        """Parse many reads directories or samples TSVs concurrently
+
+        Args:
+            inputs (list): filepaths of samples TSVs or directories
+            return_exceptions (bool): return errors in place of results instead of raising the first one
+
+        Returns:
+            dict:
+                key (str): input filepath
+                value (dict): samples dictionary (or the exception if return_exceptions)
+        """
+
+        inputs = list(inputs)
+        results = await asyncio.gather(
+            *(self.parse_samples_to_dictionary(i) for i in inputs),
+            return_exceptions=return_exceptions,
+        )
+        return dict(zip(inputs, results))
+
+    async def scan_fastas(self, inputs):
+        """Parse many fasta files, fastas TSVs or directories concurrently
+
+        Args:
+            inputs (list): filepaths of fasta files, TSVs or directories
+
+        Returns:
+            dict:
+                key (str): input filepath
+                value (dict): fastas dictionary
+        """
+
+        inputs = list(inputs)
+        results = await asyncio.gather(*(self.parse_fastas(i) for i in inputs))
+        return dict(zip(inputs, results))
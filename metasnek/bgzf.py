@@ -0,0 +1,190 @@
+import struct
+import zlib
+import collections
+import concurrent.futures
+
+
+BLOCK_SIZE = 65280
+"""Maximum uncompressed bytes per BGZF block (as used by htslib/bgzip)"""
+
+BGZF_EOF = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+"""Empty BGZF block marking the end of the file"""
+
+
+def compress_block(data, level=6):
+    """Compress a chunk of data into a single BGZF block
+
+    Args:
+        data (bytes): uncompressed data, at most BLOCK_SIZE bytes
+        level (int): zlib compression level
+
+    Returns:
+        block (bytes): complete BGZF block
+    """
+
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    cdata = compressor.compress(data) + compressor.flush()
+    block_size = len(cdata) + 25
+    header = struct.pack(
+        "<4BI2BH2BHH", 31, 139, 8, 4, 0, 0, 255, 6, 66, 67, 2, block_size
+    )
+    footer = struct.pack("<II", zlib.crc32(data) & 0xFFFFFFFF, len(data))
+    return header + cdata + footer
+
+
+class BgzfWriter:
+    """Write block-gzip (BGZF) compressed files, compressing blocks in a thread pool.
+
+    zlib releases the GIL, so independent blocks are compressed in parallel and written
+    in order. A .gzi index of block offsets is written on close so the output stays
+    randomly accessible, eg. for faidx. Accepts str or bytes and can be used as a
+    context manager in place of a file handle opened for writing; if the block exits
+    with an exception the file is left without its EOF block or index, so it reads as
+    truncated rather than complete.
+
+    Args:
+        filepath (str): filepath of compressed output file
+        threads (int): number of compression threads
+        level (int): zlib compression level
+        index (bool or str): write a .gzi index to filepath + ".gzi" (True), to a given filepath (str), or not at all (False)
+    """
+
+    def __init__(self, filepath, threads=1, level=6, index=True):
+        self.filepath = filepath
+        self.level = level
+        if index is True:
+            self.index_file = filepath + ".gzi"
+        else:
+            self.index_file = index or None
+        self._handle = open(filepath, "wb")
+        self._buffer = bytearray()
+        self._pending = collections.deque()
+        self._max_pending = max(1, threads) * 4
+        self._executor = (
+            concurrent.futures.ThreadPoolExecutor(max_workers=threads)
+            if threads > 1
+            else None
+        )
+        self._block_offsets = []
+        self._compressed_offset = 0
+        self._uncompressed_offset = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, data):
+        """Buffer data for compression, submitting full blocks as they fill
+
+        Args:
+            data (str or bytes): data to write
+
+        Returns:
+            None
+        """
+
+        if isinstance(data, str):
+            data = data.encode()
+        self._buffer += data
+        while len(self._buffer) >= BLOCK_SIZE:
+            self._submit(bytes(self._buffer[:BLOCK_SIZE]))
+            del self._buffer[:BLOCK_SIZE]
+
+    def _submit(self, data):
+        if self._executor is None:
+            self._write_block(compress_block(data, self.level), len(data))
+            return
+        self._pending.append(
+            (self._executor.submit(compress_block, data, self.level), len(data))
+        )
+        if len(self._pending) > self._max_pending:
+            future, length = self._pending.popleft()
+            self._write_block(future.result(), length)
+
+    def _write_block(self, block, length):
+        self._block_offsets.append((self._compressed_offset, self._uncompressed_offset))
+        self._handle.write(block)
+        self._compressed_offset += len(block)
+        self._uncompressed_offset += length
+
+    def close(self):
+        """Compress any remaining data, write the EOF block and the .gzi index
+
+        Returns:
+            None
+        """
+
+        if self._handle.closed:
+            return
+        if self._buffer:
+            self._submit(bytes(self._buffer))
+            self._buffer.clear()
+        while self._pending:
+            future, length = self._pending.popleft()
+            self._write_block(future.result(), length)
+        if self._executor is not None:
+            self._executor.shutdown()
+        self._handle.write(BGZF_EOF)
+        self._handle.close()
+        if self.index_file:
+            write_gzi(self._block_offsets, self.index_file)
+
+    def abort(self):
+        """Stop writing after an error, leaving out the EOF block and the .gzi index
+
+        Blocks already written are kept, but the missing EOF block marks the file as
+        incomplete. Buffered and pending blocks are discarded.
+
+        Returns:
+            None
+        """
+
+        if self._handle.closed:
+            return
+        self._buffer.clear()
+        self._pending.clear()
+        if self._executor is not None:
+            self._executor.shutdown()
+        self._handle.close()
+
+
+def write_gzi(block_offsets, index_file):
+    """Write a bgzip-compatible .gzi index
+
+    Args:
+        block_offsets (list): A list of tuples with the compressed and uncompressed offset of each block
+        index_file (str): filepath of index file for writing
+
+    Returns:
+        None
+    """
+
+    # bgzip does not store the first block, which always starts at (0, 0)
+    entries = [offsets for offsets in block_offsets if offsets != (0, 0)]
+    with open(index_file, "wb") as gzi:
+        gzi.write(struct.pack("<Q", len(entries)))
+        for compressed_offset, uncompressed_offset in entries:
+            gzi.write(struct.pack("<QQ", compressed_offset, uncompressed_offset))
+
+
+def read_gzi(index_file):
+    """Read a bgzip .gzi index
+
+    Args:
+        index_file (str): filepath of index file
+
+    Returns:
+        block_offsets (list): A list of tuples with the compressed and uncompressed offset of each block, including the first
+    """
+
+    with open(index_file, "rb") as gzi:
+        (n_entries,) = struct.unpack("<Q", gzi.read(8))
+        block_offsets = [(0, 0)]
+        for _ in range(n_entries):
+            block_offsets.append(struct.unpack("<QQ", gzi.read(16)))
+    return block_offsets
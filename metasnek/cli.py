@@ -0,0 +1,172 @@
+"""metasnek command line interface
+
+Library modules are only imported by the subcommand that needs them, so that
+startup stays fast when metasnek is invoked many times from cluster jobs.
+"""
+import sys
+import shlex
+import argparse
+
+
+def run_samples(args):
+    """Parse a reads directory or samples TSV, and write or print the samples TSV
+
+    Args:
+        args (argparse.Namespace): parsed arguments with input and output
+
+    Returns:
+        None
+    """
+
+    from metasnek.fastq_finder import parse_samples_to_dictionary, write_samples_tsv
+
+    samples = parse_samples_to_dictionary(args.input)
+    if args.output:
+        write_samples_tsv(samples, args.output)
+        return
+    for sample in sorted(samples):
+        reads = [
+            samples[sample][key]
+            for key in ("R1", "R2", "S")
+            if samples[sample].get(key) is not None
+        ]
+        print("\t".join([sample] + reads))
+
+
+def run_fastas(args):
+    """Parse a fasta file, fastas TSV or directory, and write the fastas TSV and/or the combined fasta
+
+    Args:
+        args (argparse.Namespace): parsed arguments with input, output, combine and threads
+
+    Returns:
+        None
+    """
+
+    from metasnek.fasta_finder import parse_fastas, write_fastas_tsv, combine_fastas
+
+    fastas = parse_fastas(args.input)
+    if not fastas:
+        raise ValueError(f"Failed to detect any fasta files for {args.input}")
+    if args.output:
+        write_fastas_tsv(fastas, args.output)
+    if args.combine:
+        combine_fastas(
+            fastas,
+            args.combine,
+            incremental=args.incremental,
+            threads=args.threads,
+            read_threads=args.threads,
+            min_length=args.min_length,
+            max_length=args.max_length,
+            first_token=args.first_token,
+            line_width=args.line_width,
+            name_map_file=args.name_map,
+        )
+    if not args.output and not args.combine:
+        for ref_name, filepath in fastas.items():
+            print(f"{ref_name}\t{filepath}")
+
+
+def run_batch(args):
+    """Run many subcommands in one process, one command line per line of the batch file
+
+    Args:
+        args (argparse.Namespace): parsed arguments with batch_file
+
+    Returns:
+        failed (int): number of failed commands
+    """
+
+    failed = 0
+    with open(args.batch_file, "r") as batch_file:
+        for line in batch_file:
+            command = shlex.split(line, comments=True)
+            if not command:
+                continue
+            if command[0] == "batch":
+                sys.stderr.write(f"Nested batch commands are not supported: {line}")
+                failed += 1
+                continue
+            if main(command) != 0:
+                failed += 1
+    return failed
+
+
+def build_parser():
+    """Build the metasnek argument parser
+
+    Returns:
+        parser (argparse.ArgumentParser)
+    """
+
+    parser = argparse.ArgumentParser(
+        prog="metasnek", description="Misc functions for metagenomics pipelines"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    samples = subparsers.add_parser(
+        "samples", help="Find samples in a reads directory or samples TSV"
+    )
+    samples.add_argument("input", help="reads directory or samples TSV")
+    samples.add_argument("-o", "--output", help="write the samples TSV to this file")
+    samples.set_defaults(func=run_samples)
+
+    fastas = subparsers.add_parser(
+        "fastas", help="Find fasta files and optionally combine them"
+    )
+    fastas.add_argument("input", help="fasta file, fastas TSV, or directory of fastas")
+    fastas.add_argument("-o", "--output", help="write the fastas TSV to this file")
+    fastas.add_argument("-c", "--combine", help="write the combined fasta to this file")
+    fastas.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only rewrite the combined fasta from the first changed genome",
+    )
+    fastas.add_argument(
+        "-t", "--threads", type=int, default=1, help="reader/compression threads"
+    )
+    fastas.add_argument("--min-length", type=int, help="drop shorter contigs")
+    fastas.add_argument("--max-length", type=int, help="drop longer contigs")
+    fastas.add_argument(
+        "--first-token",
+        action="store_true",
+        help="truncate headers to their first token",
+    )
+    fastas.add_argument("--line-width", type=int, help="rewrap sequence lines")
+    fastas.add_argument("--name-map", help="write a TSV of old to new contig IDs")
+    fastas.set_defaults(func=run_fastas)
+
+    batch = subparsers.add_parser(
+        "batch", help="Run many subcommands, one per line of a file, in one process"
+    )
+    batch.add_argument("batch_file", help="file of metasnek subcommand lines")
+    batch.set_defaults(func=run_batch)
+
+    return parser
+
+
+def main(argv=None):
+    """Run the metasnek command line interface
+
+    Args:
+        argv (list): command line arguments (default: sys.argv[1:])
+
+    Returns:
+        exit_code (int): 0 on success, 1 on failure
+    """
+
+    try:
+        args = build_parser().parse_args(argv)
+    except SystemExit as e:
+        return e.code
+    try:
+        failed = args.func(args)
+    except (ValueError, OSError) as e:
+        sys.stderr.write(f"metasnek {args.command}: {e}\n")
+        return 1
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+import os
+
+from metasnek.fastq_finder import has_reads_file
+from metasnek.manifest import SAMPLE_KEYS, Manifest, file_checksum
+
+
+def sample_fingerprints(samples, checksums=False):
+    """Stat every reads file in a samples dictionary
+
+    Args:
+        samples (dict): samples dictionary from parse_samples_to_dictionary()
+        checksums (bool): also checksum each file's contents
+
+    Returns:
+        dict:
+            - sample name (dict):
+                - R1/R2/S (dict): "size", "mtime" (ns) and "checksum" (or None) of the file, or None if there is no file (None, "none" or "null")
+    """
+
+    fingerprints = {}
+    for sample, reads in samples.items():
+        fingerprints[sample] = {}
+        for key in SAMPLE_KEYS:
+            filepath = reads.get(key)
+            if not has_reads_file(filepath):
+                fingerprints[sample][key] = None
+                continue
+            file_stat = os.stat(filepath)
+            fingerprints[sample][key] = {
+                "size": file_stat.st_size,
+                "mtime": file_stat.st_mtime_ns,
+                "checksum": file_checksum(filepath) if checksums else None,
+            }
+    return fingerprints
+
+
+def _content_changed(old, filepath, new_cache):
+    """Compare a stored fingerprint against the live file, checksumming only when needed"""
+
+    if old is None:
+        return False
+    if old.get("size") is None and old.get("checksum") is None:
+        return False
+    if filepath not in new_cache:
+        file_stat = os.stat(filepath)
+        new_cache[filepath] = {
+            "size": file_stat.st_size,
+            "mtime": file_stat.st_mtime_ns,
+            "checksum": None,
+        }
+    new = new_cache[filepath]
+    if old.get("size") is not None:
+        if new["size"] != old["size"]:
+            return True
+        if new["mtime"] == old["mtime"]:
+            return False
+        if old.get("checksum") is None:
+            return True
+    if new["checksum"] is None:
+        new["checksum"] = file_checksum(filepath)
+    return new["checksum"] != old["checksum"]
+
+
+def diff_samples(old, new, old_fingerprints=None):
+    """Work out which samples were added, removed, or had their reads files change.
+
+    Samples are matched by name with dictionary lookups, so this is linear in the number
+    of samples. Paths are always compared; file contents are compared when fingerprints
+    of the old files are available, either from a Manifest compiled with stats/checksums
+    or from sample_fingerprints(). Live files are only checksummed if their size is
+    unchanged but their mtime differs, or if only checksums were stored.
+
+    Args:
+        old (dict or Manifest): previous samples dictionary, or a samples Manifest
+        new (dict or Manifest): current samples dictionary, or a samples Manifest
+        old_fingerprints (dict): fingerprints of the old files from sample_fingerprints()
+
+    Returns:
+        changes (list): A list of dicts for each added, removed or modified sample, with:
+            - sample (str): sample name
+            - change (str): "added", "removed", or "modified"
+            - paths (list): R1/R2/S keys whose filepath changed
+            - contents (list): R1/R2/S keys whose file contents changed
+    """
+
+    if isinstance(old, Manifest):
+        old_samples = {}
+        stored = {}
+        for sample, reads, fingerprints in old.iter_fingerprints():
+            old_samples[sample] = reads
+            stored[sample] = {
+                key: fingerprint if has_reads_file(fingerprint["path"]) else None
+                for key, fingerprint in zip(SAMPLE_KEYS, fingerprints)
+            }
+        if old_fingerprints is None and old.flags:
+            old_fingerprints = stored
+    else:
+        old_samples = old
+    new_samples = new.to_dictionary() if isinstance(new, Manifest) else new
+
+    changes = []
+    new_cache = {}
+
+    for sample in old_samples:
+        if sample not in new_samples:
+            changes.append(
+                {"sample": sample, "change": "removed", "paths": [], "contents": []}
+            )
+
+    for sample, reads in new_samples.items():
+        if sample not in old_samples:
+            changes.append(
+                {"sample": sample, "change": "added", "paths": [], "contents": []}
+            )
+            continue
+        old_reads = old_samples[sample]
+        paths = []
+        contents = []
+        for key in SAMPLE_KEYS:
+            if reads.get(key) != old_reads.get(key):
+                paths.append(key)
+            elif old_fingerprints and has_reads_file(reads.get(key)):
+                old_fingerprint = old_fingerprints.get(sample, {}).get(key)
+                if _content_changed(old_fingerprint, reads[key], new_cache):
+                    contents.append(key)
+        if paths or contents:
+            changes.append(
+                {
+                    "sample": sample,
+                    "change": "modified",
+                    "paths": paths,
+                    "contents": contents,
+                }
+            )
+
+    return changes
+
+
+def diff_manifest_to_samples(manifest_file, input_file_or_directory):
+    """Compare a saved samples manifest against a live reads directory or samples TSV
+
+    Args:
+        manifest_file (str): filepath of samples manifest from manifest.write_manifest()
+        input_file_or_directory (str): filepath of samples TSV or directory
+
+    Returns:
+        changes (list): see diff_samples()
+    """
+
+    from metasnek.fastq_finder import parse_samples_to_dictionary
+
+    new = parse_samples_to_dictionary(input_file_or_directory)
+    with Manifest(manifest_file) as old:
+        return diff_samples(old, new)
+
+
+def write_sample_changes(changes, output_file):
+    """Write a change list to a TSV of sample name, change, changed paths, and changed contents
+
+    Args:
+        changes (list): change list from diff_samples()
+        output_file (str): filepath of output file for writing
+
+    Returns:
+        None
+    """
+
+    with open(output_file, "w") as out:
+        for change in changes:
+            out.write(
+                f"{change['sample']}\t{change['change']}\t"
+                f"{','.join(change['paths']) or '.'}\t{','.join(change['contents']) or '.'}\n"
+            )
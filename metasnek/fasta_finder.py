@@ -3,13 +3,44 @@ import warnings
 import glob
 import csv
 import re
+import heapq
+import queue
+import collections
+import contextlib
+import threading
+import concurrent.futures
 
+from metasnek.bgzf import BgzfWriter
+from metasnek.seqio import (
+    strip_compression_extension,
+    open_sequence_file,
+    prefetch_sequence_files,
+)
 
-def fastas_from_directory(fasta_directory):
+
+FASTA_EXTENSIONS = (".fasta", ".fa", ".fna", ".ffn", ".faa", ".frn")
+"""Recognised fasta file extensions, optionally followed by .gz/.bgz/.zst"""
+
+
+def is_fasta_file(file_name):
+    """Check whether a file name has a (possibly compressed) fasta extension
+
+    Args:
+        file_name (str): file name or path
+
+    Returns:
+        bool: True if the file name ends with a fasta extension
+    """
+
+    return strip_compression_extension(file_name).lower().endswith(FASTA_EXTENSIONS)
+
+
+def fastas_from_directory(fasta_directory, sniff=None):
     """Find all the fasta files in a directory and return them as a dictionary
 
     Args:
         fasta_directory (str): filepath to directory
+        sniff (str): sniff the files and "drop" or "flag" (warn about) empty, truncated or mislabelled ones
 
     Returns:
         fasta_files (dict):
@@ -21,10 +52,13 @@ def fastas_from_directory(fasta_directory):
     file_list = glob.glob(os.path.join(fasta_directory, "*"))
     for file_path in file_list:
         file_name = os.path.basename(file_path)
-        if file_name.lower().endswith(
-            (".fasta", ".fa", ".fna", ".ffn", ".faa", ".frn")
-        ):
+        if is_fasta_file(file_name):
             fasta_files[file_name] = file_path
+    if sniff:
+        from metasnek.sniff import filter_sniffed
+
+        kept = set(filter_sniffed(list(fasta_files.values()), sniff))
+        fasta_files = {k: v for k, v in fasta_files.items() if v in kept}
     return fasta_files
 
 
@@ -51,12 +85,13 @@ def parse_tsv_file(file_path):
     return fasta_files
 
 
-def parse_fastas(file_or_directory):
+def parse_fastas(file_or_directory, sniff=None):
     """Work out if file_or_directory is a fasta-file, a tsv-file, or directory;
     parse with either parse_tsv_fasta() or fastas_from_directory()
 
     Args:
         file_or_directory (str): filepath for fasta, TSV file, or directory of FASTA files
+        sniff (str): for directories, "drop" or "flag" bad files, see fastas_from_directory()
 
     Returns:
         fasta_files (dict):
@@ -67,11 +102,11 @@ def parse_fastas(file_or_directory):
     fasta_files = {}
 
     if os.path.isfile(file_or_directory):
-        if file_or_directory.lower().endswith(
-            (".fasta", ".fa", ".fna", ".ffn", ".faa", ".frn")
-        ):
+        if is_fasta_file(file_or_directory):
             fasta_files[
-                os.path.splitext(os.path.basename(file_or_directory))[0]
+                os.path.splitext(
+                    strip_compression_extension(os.path.basename(file_or_directory))
+                )[0]
             ] = file_or_directory
         elif file_or_directory.lower().endswith(".tsv"):
             fasta_files = parse_tsv_file(file_or_directory)
@@ -80,7 +115,7 @@ def parse_fastas(file_or_directory):
                 f"Unsupported file format: {file_or_directory}"
             )  # TODO: unit test, throw error
     elif os.path.isdir(file_or_directory):
-        fasta_files = fastas_from_directory(file_or_directory)
+        fasta_files = fastas_from_directory(file_or_directory, sniff=sniff)
     else:
         print(f"Input not recognized: {file_or_directory}")
 
@@ -105,7 +140,431 @@ def write_fastas_tsv(fasta_dict, fastas_tsv):
             tsv_file.write(f"{key}\t{value}\n")
 
 
-def combine_fastas(fasta_dict, fasta_file):
+def _rename_fasta_lines(ref_name, in_fasta):
+    """Yield fasta lines with the ref name added as a prefix to the contig IDs
+
+    Args:
+        ref_name (str): reference name to prefix contig IDs with
+        in_fasta (iterable): fasta lines, eg. an open file handle
+
+    Yields:
+        line (str): fasta line with renamed header
+    """
+
+    for line in in_fasta:
+        if line.startswith(">"):
+            line = line.replace(">", ">" + ref_name + ":")
+        yield line
+
+
+def _filter_fasta_lines(
+    ref_name,
+    in_fasta,
+    min_length=None,
+    max_length=None,
+    first_token=False,
+    rename=None,
+    line_width=None,
+    name_map=None,
+):
+    """Yield renamed fasta lines, dropping contigs outside the length limits and
+    optionally shortening/renaming headers and rewrapping sequence lines.
+
+    Contigs are streamed: sequence lines are only held while a contig's length limits
+    are undecided, ie. until min_length is reached, or (with max_length) until the end
+    of the contig or until it is longer than max_length. Rewrapping carries any partial
+    line over to the next input line rather than joining the whole sequence.
+
+    Args:
+        ref_name (str): reference name to prefix contig IDs with
+        in_fasta (iterable): fasta lines, eg. an open file handle
+        min_length (int): drop contigs shorter than this
+        max_length (int): drop contigs longer than this
+        first_token (bool): truncate headers to the first whitespace-delimited token
+        rename (dict): map of prefixed contig IDs (ref_name:contig_id) to new contig IDs
+        line_width (int): rewrap sequence lines to this width (0 for a single line)
+        name_map (list): if given, (old contig ID, new contig ID) tuples of kept contigs are appended
+
+    Yields:
+        line (str): fasta line, or part of one while writing a single-line sequence
+    """
+
+    def header_line(header):
+        new_header = header[1:].rstrip("\n").replace(">", ">" + ref_name + ":")
+        new_header = ref_name + ":" + new_header
+        # only the leading ID is replaced, the rest of the header is kept as is
+        contig_id, description = re.match(r"(\S*)(.*)", new_header, re.DOTALL).groups()
+        if first_token:
+            description = ""
+        new_id = rename[contig_id] if rename and contig_id in rename else contig_id
+        if name_map is not None:
+            name_map.append((contig_id, new_id))
+        return ">" + new_id + description + "\n"
+
+    def wrap(lines):
+        nonlocal carry, written
+        if line_width is None:
+            yield from lines
+            return
+        for line in lines:
+            sequence = line.rstrip("\n")
+            if not sequence:
+                continue
+            written = True
+            if line_width == 0:
+                # a single-line sequence is written in pieces as it arrives
+                yield sequence
+                continue
+            carry += sequence
+            end = len(carry) - len(carry) % line_width
+            for start in range(0, end, line_width):
+                yield carry[start : start + line_width] + "\n"
+            carry = carry[end:]
+
+    def end_contig():
+        nonlocal carry, written
+        if held is not None:
+            if min_length is not None and length < min_length:
+                return
+            yield header_line(header)
+            yield from wrap(held)
+        elif dropped:
+            return
+        if line_width == 0 and written:
+            yield "\n"
+        elif carry:
+            yield carry + "\n"
+        carry = ""
+        written = False
+
+    header = None
+    held = None
+    dropped = False
+    length = 0
+    carry = ""
+    written = False
+    for line in in_fasta:
+        if line.startswith(">"):
+            if header is not None:
+                yield from end_contig()
+            header = line
+            length = 0
+            dropped = False
+            if min_length is None and max_length is None:
+                held = None
+                yield header_line(header)
+            else:
+                held = []
+            continue
+        if header is None:
+            yield line
+            continue
+        if dropped:
+            continue
+        length += len(line.rstrip("\n"))
+        if held is None:
+            yield from wrap([line])
+            continue
+        if max_length is not None and length > max_length:
+            held = None
+            dropped = True
+            continue
+        held.append(line)
+        if max_length is None and length >= min_length:
+            yield header_line(header)
+            yield from wrap(held)
+            held = None
+    if header is not None:
+        yield from end_contig()
+
+
+def _renamed_fasta_lines(ref_name, filepath, filters=None, name_map=None):
+    """Yield the lines of a (possibly compressed) fasta file with the ref name added as a
+    prefix to the contig IDs
+
+    Args:
+        ref_name (str): reference name to prefix contig IDs with
+        filepath (str): filepath of fasta file
+        filters (dict): keyword arguments for _filter_fasta_lines(), or None to only rename
+        name_map (list): (old contig ID, new contig ID) tuples are appended here if filtering
+
+    Yields:
+        line (str): fasta line with renamed header
+    """
+
+    with open_sequence_file(filepath) as in_fasta:
+        if filters:
+            yield from _filter_fasta_lines(
+                ref_name, in_fasta, name_map=name_map, **filters
+            )
+        else:
+            yield from _rename_fasta_lines(ref_name, in_fasta)
+
+
+def write_name_map(name_map, name_map_file):
+    """Write (old contig ID, new contig ID) tuples from a filtered combine_fastas() to a TSV file
+
+    Args:
+        name_map (list): (old contig ID, new contig ID) tuples
+        name_map_file (str): filepath of TSV file for writing
+
+    Returns:
+        None
+    """
+
+    with open(name_map_file, "w") as tsv_file:
+        for old_name, new_name in name_map:
+            tsv_file.write(f"{old_name}\t{new_name}\n")
+
+
+def read_combine_manifest(manifest_file):
+    """Read the sidecar manifest written by an incremental combine_fastas()
+
+    Args:
+        manifest_file (str): filepath of manifest file
+
+    Returns:
+        tuple: A tuple containing:
+            - output_stat (tuple): size and mtime (ns) of the combined fasta when the manifest was written
+            - entries (list): A list of tuples with the ref name, source filepath, source size,
+              source mtime (ns), output offset, and output length.
+    """
+
+    output_stat = None
+    entries = []
+
+    with open(manifest_file, "r") as manifest:
+        for line in manifest:
+            l = line.rstrip("\n").split("\t")
+            if l[0] == "#output" and len(l) == 3:
+                output_stat = (int(l[1]), int(l[2]))
+            elif len(l) == 6 and not l[0].startswith("#"):
+                entries.append((l[0], l[1], int(l[2]), int(l[3]), int(l[4]), int(l[5])))
+
+    return output_stat, entries
+
+
+def write_combine_manifest(entries, fasta_file, manifest_file):
+    """Write the sidecar manifest for an incrementally combined fasta file
+
+    Args:
+        entries (list): A list of tuples with the ref name, source filepath, source size,
+            source mtime (ns), output offset, and output length.
+        fasta_file (str): filepath of combined fasta file
+        manifest_file (str): filepath of manifest file for writing
+
+    Returns:
+        None
+    """
+
+    output_stat = os.stat(fasta_file)
+    tmp_file = manifest_file + ".tmp"
+    with open(tmp_file, "w") as manifest:
+        manifest.write(f"#output\t{output_stat.st_size}\t{output_stat.st_mtime_ns}\n")
+        for entry in entries:
+            manifest.write("\t".join(str(e) for e in entry) + "\n")
+    os.replace(tmp_file, manifest_file)
+
+
+def _combine_fastas_incremental(fasta_dict, fasta_file, manifest_file):
+    """Update a combined fasta file in place using its sidecar manifest.
+
+    Genomes are compared in order against the manifest by source path, size and mtime.
+    The output is truncated at the first changed or removed genome and everything from
+    there on is rewritten; new genomes are simply appended. If nothing has changed the
+    output is left untouched. A missing or stale manifest triggers a full rebuild.
+
+    Args:
+        fasta_dict (dict):
+            key (str): file name/prefix
+            value (str): filepath
+        fasta_file (str): Filepath for concatenated fasta file
+        manifest_file (str): Filepath of sidecar manifest
+
+    Returns:
+        None
+    """
+
+    entries = []
+    valid_manifest = False
+    if os.path.isfile(fasta_file) and os.path.isfile(manifest_file):
+        output_stat, entries = read_combine_manifest(manifest_file)
+        current_stat = os.stat(fasta_file)
+        valid_manifest = output_stat == (
+            current_stat.st_size,
+            current_stat.st_mtime_ns,
+        )
+        if not valid_manifest:
+            entries = []
+
+    current = []
+    for ref_name, filepath in fasta_dict.items():
+        file_stat = os.stat(filepath)
+        current.append((ref_name, filepath, file_stat.st_size, file_stat.st_mtime_ns))
+
+    keep = 0
+    while (
+        keep < len(entries)
+        and keep < len(current)
+        and entries[keep][:4] == current[keep]
+    ):
+        keep += 1
+
+    if valid_manifest and keep == len(entries) == len(current):
+        return
+
+    if keep > 0:
+        offset = entries[keep - 1][4] + entries[keep - 1][5]
+    else:
+        offset = 0
+
+    entries = entries[:keep]
+    mode = "r+b" if os.path.isfile(fasta_file) else "wb"
+    with open(fasta_file, mode) as out_fasta:
+        out_fasta.seek(offset)
+        out_fasta.truncate()
+        for ref_name, filepath, size, mtime in current[keep:]:
+            start = out_fasta.tell()
+            for line in _renamed_fasta_lines(ref_name, filepath):
+                out_fasta.write(line.encode())
+            entries.append(
+                (ref_name, filepath, size, mtime, start, out_fasta.tell() - start)
+            )
+
+    write_combine_manifest(entries, fasta_file, manifest_file)
+
+
+def _pipelined_fasta_chunks(
+    fasta_dict,
+    read_threads,
+    max_buffer_bytes,
+    chunk_size=1048576,
+    filters=None,
+    name_maps=None,
+):
+    """Read and rename fasta files in a pool of reader threads, yielding chunks in fasta_dict order.
+
+    Readers prefetch and rewrite the next genomes into buffered chunks while the caller
+    drains them. Buffered data is capped at max_buffer_bytes, except that the genome
+    currently being drained may always queue one chunk when none of its own are waiting,
+    so the pipeline can never stall and never holds more than one chunk over the cap.
+
+    Args:
+        fasta_dict (dict):
+            key (str): file name/prefix
+            value (str): filepath
+        read_threads (int): number of reader threads
+        max_buffer_bytes (int): maximum bytes held in buffered chunks
+        chunk_size (int): approximate bytes per chunk
+        filters (dict): keyword arguments for _filter_fasta_lines(), or None to only rename
+        name_maps (list): one list per genome for (old contig ID, new contig ID) tuples if filtering
+
+    Yields:
+        chunk (str): renamed fasta data
+    """
+
+    condition = threading.Condition()
+    state = {"buffered": 0, "current": 0, "stop": False}
+    genome_queues = [queue.Queue() for _ in fasta_dict]
+    genome_buffered = [0] * len(genome_queues)
+
+    def read_genome(index, ref_name, filepath):
+        out_queue = genome_queues[index]
+        if state["stop"]:
+            return
+        try:
+            lines = []
+            size = 0
+            name_map = name_maps[index] if name_maps is not None else None
+            for line in _renamed_fasta_lines(ref_name, filepath, filters, name_map):
+                lines.append(line)
+                size += len(line)
+                if size >= chunk_size:
+                    put_chunk(index, out_queue, "".join(lines), size)
+                    lines = []
+                    size = 0
+            if lines:
+                put_chunk(index, out_queue, "".join(lines), size)
+        except Exception as e:
+            out_queue.put(e)
+            return
+        out_queue.put(None)
+
+    def put_chunk(index, out_queue, chunk, size):
+        with condition:
+            while not state["stop"] and not (
+                (index == state["current"] and genome_buffered[index] == 0)
+                or state["buffered"] + size <= max_buffer_bytes
+            ):
+                condition.wait()
+            if state["stop"]:
+                raise RuntimeError("Pipelined read cancelled")
+            state["buffered"] += size
+            genome_buffered[index] += size
+        out_queue.put(chunk)
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=read_threads)
+    try:
+        for index, (ref_name, filepath) in enumerate(fasta_dict.items()):
+            executor.submit(read_genome, index, ref_name, filepath)
+        for index, genome_queue in enumerate(genome_queues):
+            with condition:
+                state["current"] = index
+                condition.notify_all()
+            while True:
+                chunk = genome_queue.get()
+                if chunk is None:
+                    break
+                if isinstance(chunk, Exception):
+                    raise chunk
+                with condition:
+                    state["buffered"] -= len(chunk)
+                    genome_buffered[index] -= len(chunk)
+                    condition.notify_all()
+                yield chunk
+    finally:
+        with condition:
+            state["stop"] = True
+            condition.notify_all()
+        executor.shutdown(wait=True)
+
+
+def _open_fasta_output(fasta_file, compress=None, threads=1):
+    """Open a fasta file for writing, BGZF-compressed if requested or if it ends with .gz
+
+    Args:
+        fasta_file (str): filepath of fasta file for writing
+        compress (bool): write BGZF-compressed output (default: True if fasta_file ends with .gz)
+        threads (int): number of compression threads
+
+    Returns:
+        file handle or BgzfWriter
+    """
+
+    if compress is None:
+        compress = fasta_file.lower().endswith(".gz")
+    if compress:
+        return BgzfWriter(fasta_file, threads=threads)
+    return open(fasta_file, "w")
+
+
+def combine_fastas(
+    fasta_dict,
+    fasta_file,
+    incremental=False,
+    manifest_file=None,
+    compress=None,
+    threads=1,
+    decompress_threads=1,
+    read_threads=1,
+    max_buffer_bytes=268435456,
+    min_length=None,
+    max_length=None,
+    first_token=False,
+    rename=None,
+    line_width=None,
+    name_map_file=None,
+):
     """Concatenate fasta files in fasta dictionary, adding the fasta ref name (key)
     as a prefix for the contig IDs
 
@@ -114,15 +573,325 @@ def combine_fastas(fasta_dict, fasta_file):
             key (str): file name/prefix
             value (str): filepath
         fasta_file (str): Filepath for new concatenated fasta file
+        incremental (bool): Only rewrite the output from the first new, changed or removed genome onwards
+        manifest_file (str): Filepath of sidecar manifest for incremental mode (default: fasta_file + ".manifest")
+        compress (bool): write BGZF-compressed output with a .gzi index (default: True if fasta_file ends with .gz)
+        threads (int): number of compression threads
+        decompress_threads (int): number of compressed input files decompressed ahead at once
+        read_threads (int): number of reader threads prefetching and renaming genomes ahead of the writer
+        max_buffer_bytes (int): cap on renamed fasta data buffered by the reader threads
+        min_length (int): drop contigs shorter than this
+        max_length (int): drop contigs longer than this
+        first_token (bool): truncate headers to the first whitespace-delimited token
+        rename (dict): map of prefixed contig IDs (ref_name:contig_id) to new contig IDs
+        line_width (int): rewrap sequence lines to this width (0 for a single line)
+        name_map_file (str): write a TSV of old (ref name prefixed) to new contig IDs of the kept contigs
 
     Returns:
         None
     """
 
-    with open(fasta_file, "w") as out_fasta:
-        for ref_name, filepath in fasta_dict.items():
-            with open(filepath, "r") as in_fasta:
-                for line in in_fasta:
-                    if line.startswith(">"):
-                        line = line.replace(">", ">" + ref_name + ":")
-                    out_fasta.write(line)
+    filters = None
+    if (
+        min_length is not None
+        or max_length is not None
+        or first_token
+        or rename
+        or line_width is not None
+        or name_map_file
+    ):
+        filters = {
+            "min_length": min_length,
+            "max_length": max_length,
+            "first_token": first_token,
+            "rename": rename,
+            "line_width": line_width,
+        }
+
+    if incremental:
+        if compress or (compress is None and fasta_file.lower().endswith(".gz")):
+            raise ValueError("Incremental mode does not support compressed output")
+        if filters:
+            raise ValueError("Incremental mode does not support contig filtering")
+        if manifest_file is None:
+            manifest_file = fasta_file + ".manifest"
+        _combine_fastas_incremental(fasta_dict, fasta_file, manifest_file)
+        return
+
+    name_maps = [[] for _ in fasta_dict] if filters else None
+    with _open_fasta_output(fasta_file, compress, threads) as out_fasta:
+        if read_threads > 1:
+            for chunk in _pipelined_fasta_chunks(
+                fasta_dict,
+                read_threads,
+                max_buffer_bytes,
+                filters=filters,
+                name_maps=name_maps,
+            ):
+                out_fasta.write(chunk)
+        else:
+            in_fastas = prefetch_sequence_files(
+                fasta_dict.values(), parallel=decompress_threads
+            )
+            for index, (ref_name, in_fasta) in enumerate(
+                zip(fasta_dict.keys(), in_fastas)
+            ):
+                with in_fasta:
+                    if filters:
+                        lines = _filter_fasta_lines(
+                            ref_name, in_fasta, name_map=name_maps[index], **filters
+                        )
+                    else:
+                        lines = _rename_fasta_lines(ref_name, in_fasta)
+                    for line in lines:
+                        out_fasta.write(line)
+
+    if name_map_file:
+        write_name_map(
+            [names for name_map in name_maps for names in name_map], name_map_file
+        )
+
+
+def fasta_contig_lengths(filepath):
+    """Get the contig lengths of a fasta file, from its .fai index if available
+
+    Args:
+        filepath (str): filepath of fasta file
+
+    Returns:
+        contig_lengths (dict):
+            key (str): contig ID (first token of the header)
+            value (int): contig length in bases
+    """
+
+    contig_lengths = {}
+
+    if os.path.isfile(filepath + ".fai"):
+        with open(filepath + ".fai", "r") as fai_file:
+            for line in fai_file:
+                l = line.split("\t")
+                if len(l) >= 2:
+                    contig_lengths[l[0]] = int(l[1])
+        return contig_lengths
+
+    contig_id = None
+    with open_sequence_file(filepath) as in_fasta:
+        for line in in_fasta:
+            if line.startswith(">"):
+                contig_id = line[1:].split(maxsplit=1)[0] if line[1:].strip() else ""
+                contig_lengths.setdefault(contig_id, 0)
+            elif contig_id is not None:
+                contig_lengths[contig_id] += len(line.strip())
+
+    return contig_lengths
+
+
+def balance_shards(sizes, n_shards):
+    """Distribute items across shards with greedy largest-first bin packing
+
+    Args:
+        sizes (dict):
+            key: item (eg. ref name)
+            value (int): item size
+        n_shards (int): number of shards
+
+    Returns:
+        shards (list): A list of n_shards lists of items, each in their original order
+    """
+
+    if n_shards < 1:
+        raise ValueError(f"n_shards must be at least 1, got {n_shards}")
+
+    order = {item: i for i, item in enumerate(sizes)}
+    loads = [(0, shard) for shard in range(n_shards)]
+    heapq.heapify(loads)
+    shards = [[] for _ in range(n_shards)]
+
+    for item in sorted(sizes, key=lambda k: (-sizes[k], order[k])):
+        load, shard = heapq.heappop(loads)
+        shards[shard].append(item)
+        heapq.heappush(loads, (load + sizes[item], shard))
+
+    return [sorted(shard, key=order.get) for shard in shards]
+
+
+def _write_shard(fasta_dict, ref_names, shard_file, compress=False):
+    """Write one whole-genome shard of a sharded combine_fastas()
+
+    Args:
+        fasta_dict (dict):
+            key (str): file name/prefix
+            value (str): filepath
+        ref_names (list): ref names of the genomes in this shard
+        shard_file (str): filepath of shard for writing
+        compress (bool): write BGZF-compressed output
+
+    Returns:
+        shard_file (str): filepath of written shard
+    """
+
+    with _open_fasta_output(shard_file, compress) as out_fasta:
+        for ref_name in ref_names:
+            for line in _renamed_fasta_lines(ref_name, fasta_dict[ref_name]):
+                out_fasta.write(line)
+    return shard_file
+
+
+def _split_genome_contigs(ref_name, filepath, shard_of):
+    """Read one genome, grouping its renamed contigs by the shard they were assigned to
+
+    The whole genome is returned in memory, split between its shards.
+
+    Args:
+        ref_name (str): reference name of the genome
+        filepath (str): filepath of fasta file
+        shard_of (dict):
+            key (tuple): (ref name, contig ID)
+            value (int): shard number
+
+    Returns:
+        shard_data (dict):
+            key (int): shard number
+            value (str): renamed contigs for that shard, in file order
+    """
+
+    shard_lines = {}
+
+    def add(contig_id, lines):
+        if contig_id is None:
+            return
+        if (ref_name, contig_id) not in shard_of:
+            raise ValueError(
+                f"Contig {contig_id} of {ref_name} was not found in the shard sizes"
+            )
+        shard_lines.setdefault(shard_of[(ref_name, contig_id)], []).extend(lines)
+
+    contig_id = None
+    lines = []
+    for line in _renamed_fasta_lines(ref_name, filepath):
+        if line.startswith(">"):
+            add(contig_id, lines)
+            header = line[len(ref_name) + 2 :]
+            contig_id = header.split(maxsplit=1)[0] if header.strip() else ""
+            lines = []
+        lines.append(line)
+    add(contig_id, lines)
+    return {shard: "".join(lines) for shard, lines in shard_lines.items()}
+
+
+def combine_fastas_sharded(
+    fasta_dict,
+    shard_prefix,
+    n_shards,
+    split_contigs=False,
+    sizes=None,
+    threads=None,
+    compress=False,
+):
+    """Concatenate fasta files in fasta dictionary into n_shards files with balanced total bases,
+    adding the fasta ref name (key) as a prefix for the contig IDs. Shards are written
+    concurrently and a shard manifest is written to shard_prefix + ".manifest.tsv".
+
+    With split_contigs, every shard is open at once and the genomes are distributed in a
+    single pass, each contig going to whichever shard it was assigned to. Genomes are
+    read concurrently but written in fasta_dict order, so up to 2 * threads whole genomes
+    are held in memory at once. Contig sizes come from sizes, or from .fai indexes; any
+    genome with neither is first scanned for its contig lengths (in the thread pool), so
+    it is read twice.
+
+    Args:
+        fasta_dict (dict):
+            key (str): file name/prefix
+            value (str): filepath
+        shard_prefix (str): filepath prefix for shards, shards are named shard_prefix.N.fasta(.gz)
+        n_shards (int): number of shards to write
+        split_contigs (bool): distribute individual contigs instead of whole genomes
+        sizes (dict): precomputed base counts keyed by ref name, or by (ref name, contig ID)
+            if split_contigs (default: file sizes, or .fai/contig lengths if split_contigs)
+        threads (int): number of concurrent shard writers, or genome readers if split_contigs (default: n_shards)
+        compress (bool): write BGZF-compressed shards with .gzi indexes
+
+    Returns:
+        shard_files (list): filepaths of the written shards
+    """
+
+    if split_contigs and sizes is not None:
+        for item in sizes:
+            if not (
+                isinstance(item, tuple) and len(item) == 2 and item[0] in fasta_dict
+            ):
+                raise ValueError(
+                    f"sizes must be keyed by (ref name, contig ID) with split_contigs, got {item!r}"
+                )
+        item_sizes = dict(sizes)
+    elif split_contigs:
+        item_sizes = {}
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=threads or n_shards
+        ) as executor:
+            contig_lengths = executor.map(fasta_contig_lengths, fasta_dict.values())
+            for ref_name, lengths in zip(fasta_dict, contig_lengths):
+                for contig_id, length in lengths.items():
+                    item_sizes[(ref_name, contig_id)] = length
+    elif sizes is not None:
+        missing = [ref_name for ref_name in fasta_dict if ref_name not in sizes]
+        if missing:
+            raise ValueError(f"sizes is missing ref names: {', '.join(missing)}")
+        item_sizes = {ref_name: sizes[ref_name] for ref_name in fasta_dict}
+    else:
+        item_sizes = {
+            ref_name: os.path.getsize(filepath)
+            for ref_name, filepath in fasta_dict.items()
+        }
+
+    shards = balance_shards(item_sizes, n_shards)
+    extension = ".fasta.gz" if compress else ".fasta"
+    shard_files = [f"{shard_prefix}.{i}{extension}" for i in range(n_shards)]
+
+    if split_contigs:
+        shard_of = {item: i for i, items in enumerate(shards) for item in items}
+        workers = threads or n_shards
+        with contextlib.ExitStack() as stack:
+            out_fastas = [
+                stack.enter_context(_open_fasta_output(shard_file, compress))
+                for shard_file in shard_files
+            ]
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+                # genomes are split in parallel, but written in fasta_dict order so
+                # shard contents are deterministic; at most 2 * workers are held at once
+                pending = collections.deque()
+                for ref_name, filepath in fasta_dict.items():
+                    pending.append(
+                        executor.submit(
+                            _split_genome_contigs, ref_name, filepath, shard_of
+                        )
+                    )
+                    if len(pending) >= 2 * workers:
+                        for shard, data in pending.popleft().result().items():
+                            out_fastas[shard].write(data)
+                while pending:
+                    for shard, data in pending.popleft().result().items():
+                        out_fastas[shard].write(data)
+    else:
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=threads or n_shards
+        ) as executor:
+            futures = [
+                executor.submit(_write_shard, fasta_dict, items, shard_file, compress)
+                for items, shard_file in zip(shards, shard_files)
+            ]
+            for future in futures:
+                future.result()
+
+    with open(shard_prefix + ".manifest.tsv", "w") as manifest:
+        for shard_file, items in zip(shard_files, shards):
+            for item in items:
+                if split_contigs:
+                    ref_name, contig_id = item
+                else:
+                    ref_name, contig_id = item, "."
+                manifest.write(
+                    f"{shard_file}\t{ref_name}\t{contig_id}\t{item_sizes[item]}\n"
+                )
+
+    return shard_files
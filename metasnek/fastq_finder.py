@@ -5,11 +5,25 @@ import csv
 import re
 
 
+def has_reads_file(filepath):
+    """Check a samples dictionary entry is a reads file rather than None, "none" or "null"
+
+    Args:
+        filepath (str): R1, R2 or S entry of a samples dictionary
+
+    Returns:
+        bool: True if filepath names a reads file
+    """
+
+    return bool(filepath) and filepath.lower() not in ["none", "null"]
+
+
 def parse_directory(
     file_list,
     r1_flags=["_R1.", "_R1_", ".R1.", ".R1_", "_1_", "_1.", ".1.", ".1_"],
     r2_flags=["_R2.", "_R2_", ".R2.", ".R2_", "_2_", "_2.", ".2.", ".2_"],
     ext_pattern=r".(fasta|fastq|fq)(.gz)?$",
+    sniff=None,
 ):
     """Pairs samples from a list of files.
 
@@ -18,6 +32,7 @@ def parse_directory(
         r1_flags (list): list of string patterns of allowable R1 flags
         r2_flags (list): list of string patterns of allowable R2 flags
         ext_pattern (str): (raw-)string of regex for matching file extension, eg ext_pattern=r".(fasta|fastq|fq)(.gz)?$"
+        sniff (str): sniff the files and "drop" or "flag" (warn about) empty, truncated or mislabelled ones
 
     Returns:
         tuple: A tuple containing two sets:
@@ -35,6 +50,11 @@ def parse_directory(
         if re.search(ext_pattern, file_name, re.IGNORECASE):
             fastq_files.add(file)
 
+    if sniff:
+        from metasnek.sniff import filter_sniffed
+
+        fastq_files = set(filter_sniffed(sorted(fastq_files), sniff))
+
     # add paired files
     for r1_pattern in r1_flags:
         for file in list(fastq_files):
@@ -72,6 +92,39 @@ def parse_directory(
     return out_paired, out_unpaired
 
 
+def _parse_tsv_row(row):
+    """Split a samples TSV row into the sample name, R1 file, and optional R2 and singleton files"""
+
+    sample_name = row[0].strip()
+    r1_file = row[1].strip()
+    r2_file = row[2].strip() if len(row) >= 3 else None
+    s_file = row[3].strip() if len(row) >= 4 else None
+    return sample_name, r1_file, r2_file, s_file
+
+
+def _check_tsv_reads(r1_file, r2_file, s_file, isfile=os.path.isfile):
+    """Raise FileNotFoundError if any reads file of a samples TSV row does not exist
+
+    Args:
+        r1_file (str): R1 filepath
+        r2_file (str): R2 filepath, None, or "none"/"null"
+        s_file (str): singleton filepath, None, or "none"/"null"
+        isfile (function): function to check a filepath exists
+
+    Returns:
+        None
+    """
+
+    if not isfile(r1_file):
+        raise FileNotFoundError(f"R1 file '{r1_file}' does not exist.")
+
+    if r2_file and not isfile(r2_file) and not r2_file.lower() in ["none", "null"]:
+        raise FileNotFoundError(f"R2 file '{r2_file}' does not exist.")
+
+    if s_file and not isfile(s_file) and not s_file.lower() in ["none", "null"]:
+        raise FileNotFoundError(f"S file '{s_file}' does not exist.")
+
+
 def parse_tsv_file(file_path):
     """Parses a 2-4 column TSV file of sample names and sequencing reads (column 3/4 is optional)
 
@@ -91,27 +144,8 @@ def parse_tsv_file(file_path):
         reader = csv.reader(tsv_file, delimiter="\t")
 
         for row in reader:
-            sample_name = row[0].strip()
-            r1_file = row[1].strip()
-            r2_file = row[2].strip() if len(row) >= 3 else None
-            s_file = row[3].strip() if len(row) >= 4 else None
-
-            if not os.path.isfile(r1_file):
-                raise FileNotFoundError(f"R1 file '{r1_file}' does not exist.")
-
-            if (
-                r2_file
-                and not os.path.isfile(r2_file)
-                and not r2_file.lower() in ["none", "null"]
-            ):
-                raise FileNotFoundError(f"R2 file '{r2_file}' does not exist.")
-
-            if (
-                s_file
-                and not os.path.isfile(s_file)
-                and not s_file.lower() in ["none", "null"]
-            ):
-                raise FileNotFoundError(f"S file '{s_file}' does not exist.")
+            sample_name, r1_file, r2_file, s_file = _parse_tsv_row(row)
+            _check_tsv_reads(r1_file, r2_file, s_file)
 
             if r2_file:
                 paired_reads.add((sample_name, r1_file, r2_file, s_file))
@@ -121,11 +155,12 @@ def parse_tsv_file(file_path):
     return paired_reads, unpaired_reads
 
 
-def parse_samples(input_file_or_directory):
+def parse_samples(input_file_or_directory, sniff=None):
     """Work out if filepath is a file or directory and run appropriate parser
 
     Args:
         input_file_or_directory (str): filepath for TSV file or directory of reads
+        sniff (str): for directories, "drop" or "flag" bad files, see parse_directory()
 
     Returns:
         tuple: A tuple containing two lists:
@@ -134,7 +169,7 @@ def parse_samples(input_file_or_directory):
     """
     if os.path.isdir(input_file_or_directory):
         file_list = glob.glob(os.path.join(input_file_or_directory, "*"))
-        paired_files, unpaired_files = parse_directory(file_list)
+        paired_files, unpaired_files = parse_directory(file_list, sniff=sniff)
     elif os.path.isfile(input_file_or_directory):
         try:
             paired_files, unpaired_files = parse_tsv_file(input_file_or_directory)
@@ -180,11 +215,12 @@ def convert_to_dictionary(paired_reads, unpaired_reads):
     return reads_dictionary
 
 
-def parse_samples_to_dictionary(input_file_or_directory):
+def parse_samples_to_dictionary(input_file_or_directory, sniff=None):
     """Convenience function to parse the samples directory or TSV and return the samples dictionary
 
     Args:
         input_file_or_directory (str): filepath of samples TSV or directory
+        sniff (str): for directories, "drop" or "flag" bad files, see parse_directory()
 
     Returns:
         dict:
@@ -193,7 +229,7 @@ def parse_samples_to_dictionary(input_file_or_directory):
                 - R2 (str): filepath of R2 reads file or None for unpaired
                 - S (str): filepath of singleton reads file or None
     """
-    paired, unpaired = parse_samples(input_file_or_directory)
+    paired, unpaired = parse_samples(input_file_or_directory, sniff=sniff)
     sample_dictionary = convert_to_dictionary(paired, unpaired)
     return sample_dictionary
 
@@ -0,0 +1,439 @@
+"""Compiled binary manifests of samples or fasta dictionaries
+
+A manifest is a single file laid out as:
+
+- header: magic, version, flags, kind, number of records, section offsets
+- records: fixed-width rows of (offset, length) references into the string table for the
+  name and each path, followed by optional size, mtime and checksum columns per path
+- index: record numbers sorted by name, for binary-search lookups
+- string table: UTF-8 names and paths
+
+Manifests are read through mmap and only the records that are looked up get decoded.
+"""
+import os
+import mmap
+import struct
+import hashlib
+
+from metasnek.fastq_finder import has_reads_file
+
+
+MAGIC = b"MSNK"
+VERSION = 1
+
+FLAG_SIZE = 1
+FLAG_MTIME = 2
+FLAG_CHECKSUM = 4
+
+KIND_SAMPLES = 0
+KIND_FASTAS = 1
+
+SAMPLE_KEYS = ("R1", "R2", "S")
+
+HEADER = struct.Struct("<4sHHBBHIQQQ")
+STRING_REF = struct.Struct("<QI")
+INDEX_ENTRY = struct.Struct("<I")
+NONE_LENGTH = 0xFFFFFFFF
+
+
+def file_checksum(filepath, block_size=1048576):
+    """Calculate a 64-bit blake2b checksum of a file's contents
+
+    Args:
+        filepath (str): filepath to checksum
+        block_size (int): bytes read at a time
+
+    Returns:
+        checksum (int): 64-bit checksum
+    """
+
+    digest = hashlib.blake2b(digest_size=8)
+    with open(filepath, "rb") as in_file:
+        for block in iter(lambda: in_file.read(block_size), b""):
+            digest.update(block)
+    return int.from_bytes(digest.digest(), "little")
+
+
+def _record_struct(n_paths, flags):
+    """Build the fixed-width struct for one record"""
+
+    fmt = "<" + "QI" * (n_paths + 1)
+    if flags & FLAG_SIZE:
+        fmt += "Q" * n_paths
+    if flags & FLAG_MTIME:
+        fmt += "q" * n_paths
+    if flags & FLAG_CHECKSUM:
+        fmt += "Q" * n_paths
+    return struct.Struct(fmt)
+
+
+def pack_manifest(dictionary, stats=False, checksums=False):
+    """Compile a samples or fastas dictionary into the binary manifest layout
+
+    Args:
+        dictionary (dict): samples dictionary from parse_samples_to_dictionary(), or
+            fastas dictionary from parse_fastas()
+        stats (bool): store the size and mtime of each file
+        checksums (bool): store a checksum of each file's contents
+
+    Returns:
+        manifest (bytes): packed manifest
+    """
+
+    if dictionary and isinstance(next(iter(dictionary.values())), dict):
+        kind = KIND_SAMPLES
+        rows = [
+            (name, [reads.get(key) for key in SAMPLE_KEYS])
+            for name, reads in dictionary.items()
+        ]
+    else:
+        kind = KIND_FASTAS
+        rows = [(name, [filepath]) for name, filepath in dictionary.items()]
+    n_paths = len(SAMPLE_KEYS) if kind == KIND_SAMPLES else 1
+
+    flags = 0
+    if stats:
+        flags |= FLAG_SIZE | FLAG_MTIME
+    if checksums:
+        flags |= FLAG_CHECKSUM
+    record = _record_struct(n_paths, flags)
+
+    strings = bytearray()
+
+    def add_string(value):
+        if value is None:
+            return (0, NONE_LENGTH)
+        encoded = value.encode()
+        offset = len(strings)
+        strings.extend(encoded)
+        return (offset, len(encoded))
+
+    records = bytearray()
+    for name, paths in rows:
+        values = list(add_string(name))
+        for path in paths:
+            values.extend(add_string(path))
+        stat_values = [
+            os.stat(path)
+            if has_reads_file(path) and flags & (FLAG_SIZE | FLAG_MTIME)
+            else None
+            for path in paths
+        ]
+        if flags & FLAG_SIZE:
+            values.extend(s.st_size if s else 0 for s in stat_values)
+        if flags & FLAG_MTIME:
+            values.extend(s.st_mtime_ns if s else 0 for s in stat_values)
+        if flags & FLAG_CHECKSUM:
+            values.extend(file_checksum(p) if has_reads_file(p) else 0 for p in paths)
+        records.extend(record.pack(*values))
+
+    names = [name.encode() for name, _ in rows]
+    index = bytearray()
+    for i in sorted(range(len(rows)), key=names.__getitem__):
+        index.extend(INDEX_ENTRY.pack(i))
+
+    records_offset = HEADER.size
+    index_offset = records_offset + len(records)
+    strings_offset = index_offset + len(index)
+    header = HEADER.pack(
+        MAGIC,
+        VERSION,
+        flags,
+        kind,
+        n_paths,
+        0,
+        len(rows),
+        records_offset,
+        index_offset,
+        strings_offset,
+    )
+
+    return b"".join((header, records, index, strings))
+
+
+def write_manifest(dictionary, manifest_file, stats=False, checksums=False):
+    """Compile a samples or fastas dictionary into a binary manifest
+
+    Args:
+        dictionary (dict): samples dictionary from parse_samples_to_dictionary(), or
+            fastas dictionary from parse_fastas()
+        manifest_file (str): filepath of manifest for writing
+        stats (bool): store the size and mtime of each file
+        checksums (bool): store a checksum of each file's contents
+
+    Returns:
+        None
+    """
+
+    tmp_file = manifest_file + ".tmp"
+    with open(tmp_file, "wb") as out:
+        out.write(pack_manifest(dictionary, stats, checksums))
+    os.replace(tmp_file, manifest_file)
+
+
+class Manifest:
+    """Read-only, lazily decoded view of a binary manifest
+
+    Looking up a name binary-searches the sorted index and decodes only the matching
+    record, so jobs that need one sample's paths never parse the whole manifest.
+    Behaves like a read-only dictionary of the same shape as the one it was compiled from.
+
+    Args:
+        manifest_file (str): filepath of manifest
+    """
+
+    def __init__(self, manifest_file):
+        self.manifest_file = manifest_file
+        with open(manifest_file, "rb") as in_file:
+            self._buffer = mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._init_from_buffer(self._buffer)
+
+    def _init_from_buffer(self, buffer):
+        """Read the header of a packed manifest held in any buffer (mmap, memoryview, bytes)"""
+
+        self._buffer = buffer
+        if len(buffer) < HEADER.size:
+            raise ValueError(f"{self.manifest_file} is not a metasnek manifest")
+        (
+            magic,
+            version,
+            self.flags,
+            self.kind,
+            self.n_paths,
+            _,
+            self._n_records,
+            self._records_offset,
+            self._index_offset,
+            self._strings_offset,
+        ) = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.manifest_file} is not a metasnek manifest")
+        if version > VERSION:
+            raise ValueError(
+                f"{self.manifest_file} has unsupported manifest version {version}"
+            )
+        self._record = _record_struct(self.n_paths, self.flags)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Release the memory map
+
+        Returns:
+            None
+        """
+
+        self._buffer.close()
+
+    def __len__(self):
+        return self._n_records
+
+    def _string(self, offset, length):
+        if length == NONE_LENGTH:
+            return None
+        start = self._strings_offset + offset
+        return bytes(self._buffer[start : start + length]).decode()
+
+    def _values(self, i):
+        return self._record.unpack_from(
+            self._buffer, self._records_offset + i * self._record.size
+        )
+
+    def _name(self, i):
+        offset, length = STRING_REF.unpack_from(
+            self._buffer, self._records_offset + i * self._record.size
+        )
+        return self._string(offset, length)
+
+    def _find(self, name):
+        low = 0
+        high = self._n_records
+        encoded = name.encode()
+        while low < high:
+            middle = (low + high) // 2
+            (i,) = INDEX_ENTRY.unpack_from(
+                self._buffer, self._index_offset + middle * INDEX_ENTRY.size
+            )
+            offset, length = STRING_REF.unpack_from(
+                self._buffer, self._records_offset + i * self._record.size
+            )
+            start = self._strings_offset + offset
+            candidate = bytes(self._buffer[start : start + length])
+            if candidate == encoded:
+                return i
+            if candidate < encoded:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def _paths(self, i):
+        values = self._values(i)
+        return [
+            self._string(values[2 * p + 2], values[2 * p + 3])
+            for p in range(self.n_paths)
+        ]
+
+    def _entry(self, i):
+        paths = self._paths(i)
+        if self.kind == KIND_SAMPLES:
+            return dict(zip(SAMPLE_KEYS, paths))
+        return paths[0]
+
+    def __contains__(self, name):
+        return self._find(name) is not None
+
+    def __getitem__(self, name):
+        i = self._find(name)
+        if i is None:
+            raise KeyError(name)
+        return self._entry(i)
+
+    def get(self, name, default=None):
+        """Look up a sample or reference by name
+
+        Args:
+            name (str): sample or reference name
+            default: returned if name is not in the manifest
+
+        Returns:
+            reads dictionary (samples) or filepath (fastas)
+        """
+
+        i = self._find(name)
+        return default if i is None else self._entry(i)
+
+    def __iter__(self):
+        return self.keys()
+
+    def keys(self):
+        """Iterate names in their original order"""
+
+        for i in range(self._n_records):
+            yield self._name(i)
+
+    def items(self):
+        """Iterate (name, entry) pairs in their original order"""
+
+        for i in range(self._n_records):
+            yield self._name(i), self._entry(i)
+
+    def fingerprints(self, name):
+        """Get the stored size, mtime and checksum of each of a sample's files
+
+        Args:
+            name (str): sample or reference name
+
+        Returns:
+            list: A list of dicts with "path", "size", "mtime" and "checksum" (None if not stored) per file
+        """
+
+        i = self._find(name)
+        if i is None:
+            raise KeyError(name)
+        return self._fingerprints(i)
+
+    def _fingerprints(self, i):
+        values = self._values(i)
+        column = 2 * (self.n_paths + 1)
+        columns = {}
+        for flag, key in (
+            (FLAG_SIZE, "size"),
+            (FLAG_MTIME, "mtime"),
+            (FLAG_CHECKSUM, "checksum"),
+        ):
+            if self.flags & flag:
+                columns[key] = values[column : column + self.n_paths]
+                column += self.n_paths
+        return [
+            {
+                "path": path,
+                "size": columns["size"][p] if "size" in columns else None,
+                "mtime": columns["mtime"][p] if "mtime" in columns else None,
+                "checksum": columns["checksum"][p] if "checksum" in columns else None,
+            }
+            for p, path in enumerate(self._paths(i))
+        ]
+
+    def iter_fingerprints(self):
+        """Iterate (name, entry, fingerprints) in their original order, see fingerprints()"""
+
+        for i in range(self._n_records):
+            yield self._name(i), self._entry(i), self._fingerprints(i)
+
+    def to_dictionary(self):
+        """Decode the whole manifest
+
+        Returns:
+            dict: samples dictionary or fastas dictionary, in the original order
+        """
+
+        return dict(self.items())
+
+
+def load_manifest(manifest_file):
+    """Open a binary manifest for lazy lookups
+
+    Args:
+        manifest_file (str): filepath of manifest
+
+    Returns:
+        Manifest
+    """
+
+    return Manifest(manifest_file)
+
+
+def tsv_to_manifest(
+    tsv_file, manifest_file, fastas=False, stats=False, checksums=False
+):
+    """Compile a samples TSV (or fastas TSV) into a binary manifest
+
+    Args:
+        tsv_file (str): filepath of samples or fastas TSV
+        manifest_file (str): filepath of manifest for writing
+        fastas (bool): tsv_file is a fastas TSV rather than a samples TSV
+        stats (bool): store the size and mtime of each file
+        checksums (bool): store a checksum of each file's contents
+
+    Returns:
+        None
+    """
+
+    if fastas:
+        from metasnek.fasta_finder import parse_tsv_file
+
+        dictionary = parse_tsv_file(tsv_file)
+    else:
+        from metasnek.fastq_finder import parse_samples_to_dictionary
+
+        dictionary = parse_samples_to_dictionary(tsv_file)
+    write_manifest(dictionary, manifest_file, stats=stats, checksums=checksums)
+
+
+def manifest_to_tsv(manifest_file, tsv_file):
+    """Write a binary manifest back out as a samples or fastas TSV
+
+    Args:
+        manifest_file (str): filepath of manifest
+        tsv_file (str): filepath of TSV for writing
+
+    Returns:
+        None
+    """
+
+    with Manifest(manifest_file) as manifest:
+        dictionary = manifest.to_dictionary()
+        kind = manifest.kind
+    if kind == KIND_SAMPLES:
+        from metasnek.fastq_finder import write_samples_tsv
+
+        write_samples_tsv(dictionary, tsv_file)
+    else:
+        from metasnek.fasta_finder import write_fastas_tsv
+
+        write_fastas_tsv(dictionary, tsv_file)
@@ -0,0 +1,209 @@
+import os
+import io
+import gzip
+import queue
+import threading
+
+
+COMPRESSION_EXTENSIONS = (".gz", ".bgz", ".zst")
+"""Recognised compressed-file extensions"""
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def strip_compression_extension(file_name):
+    """Remove a trailing compression extension from a file name
+
+    Args:
+        file_name (str): file name or path
+
+    Returns:
+        file_name (str): file name without .gz/.bgz/.zst extension
+    """
+
+    if file_name.lower().endswith(COMPRESSION_EXTENSIONS):
+        return os.path.splitext(file_name)[0]
+    return file_name
+
+
+def detect_compression(filepath):
+    """Detect the compression of a file from its magic bytes
+
+    Args:
+        filepath (str): filepath to check
+
+    Returns:
+        compression (str): one of "bgzf", "gzip", "zstd", or None for uncompressed
+    """
+
+    with open(filepath, "rb") as in_file:
+        magic = in_file.read(16)
+
+    if magic.startswith(GZIP_MAGIC):
+        # BGZF blocks are gzip members with a "BC" extra subfield
+        if len(magic) >= 14 and magic[3] & 4 and magic[12:14] == b"BC":
+            return "bgzf"
+        return "gzip"
+    if magic.startswith(ZSTD_MAGIC):
+        return "zstd"
+    return None
+
+
+def _open_decompressed(filepath, compression):
+    """Open a binary stream of decompressed data"""
+
+    if compression in ("gzip", "bgzf"):
+        return gzip.open(filepath, "rb")
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError(
+                f"Reading zstd-compressed file {filepath} requires the zstandard package"
+            )
+        return zstandard.ZstdDecompressor().stream_reader(
+            open(filepath, "rb"), read_across_frames=True, closefd=True
+        )
+    return open(filepath, "rb")
+
+
+class _QueueRaw(io.RawIOBase):
+    """Raw stream reading chunks of decompressed data from a background thread"""
+
+    def __init__(self, filepath, compression, chunk_size, max_chunks):
+        self._queue = queue.Queue(maxsize=max_chunks)
+        self._stop = threading.Event()
+        self._chunk = b""
+        self._eof = False
+        self._thread = threading.Thread(
+            target=self._decompress,
+            args=(filepath, compression, chunk_size),
+            daemon=True,
+        )
+        self._thread.start()
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _decompress(self, filepath, compression, chunk_size):
+        try:
+            with _open_decompressed(filepath, compression) as in_file:
+                while not self._stop.is_set():
+                    chunk = in_file.read(chunk_size)
+                    if not chunk:
+                        break
+                    if not self._put(chunk):
+                        return
+        except Exception as e:
+            self._put(e)
+            return
+        self._put(b"")
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._chunk and not self._eof:
+            item = self._queue.get()
+            if isinstance(item, Exception):
+                self._eof = True
+                raise item
+            if not item:
+                self._eof = True
+            self._chunk = item
+        length = min(len(buffer), len(self._chunk))
+        buffer[:length] = self._chunk[:length]
+        self._chunk = self._chunk[length:]
+        return length
+
+    def close(self):
+        self._stop.set()
+        super().close()
+
+
+def open_sequence_file(filepath, chunk_size=1048576, max_chunks=16):
+    """Open a possibly-compressed sequence file for reading as text.
+
+    Gzip, bgzip and zstd (requires the zstandard package) are detected from the magic bytes.
+    Compressed files are decompressed in a background thread feeding a bounded queue of
+    chunks, so decompression overlaps with whatever the caller does with the lines.
+
+    Args:
+        filepath (str): filepath of sequence file
+        chunk_size (int): bytes of decompressed data per queued chunk
+        max_chunks (int): maximum number of chunks buffered ahead of the reader
+
+    Returns:
+        text file handle
+    """
+
+    compression = detect_compression(filepath)
+    if compression is None:
+        return open(filepath, "r")
+    raw = _QueueRaw(filepath, compression, chunk_size, max_chunks)
+    return io.TextIOWrapper(io.BufferedReader(raw, chunk_size))
+
+
+def prefetch_sequence_files(filepaths, parallel=2, **kwargs):
+    """Open sequence files in order, starting decompression of the next few files early
+
+    Args:
+        filepaths (list): filepaths of sequence files
+        parallel (int): number of files being decompressed at once
+        **kwargs: passed to open_sequence_file()
+
+    Yields:
+        text file handle for each filepath, in the original order; the caller should close each one
+    """
+
+    filepaths = list(filepaths)
+    opened = []
+    next_file = 0
+    try:
+        while next_file < len(filepaths) or opened:
+            while next_file < len(filepaths) and len(opened) < max(1, parallel):
+                opened.append(open_sequence_file(filepaths[next_file], **kwargs))
+                next_file += 1
+            yield opened.pop(0)
+    finally:
+        for handle in opened:
+            handle.close()
+
+
+def iter_records(in_file):
+    """Iterate the records of an open fasta or fastq file as text
+
+    Args:
+        in_file (file handle): text file handle, eg. from open_sequence_file()
+
+    Yields:
+        record (str): complete record including the header line
+    """
+
+    first = in_file.readline()
+    if not first:
+        return
+    if first.startswith("@"):
+        lines = [first]
+        for line in in_file:
+            lines.append(line)
+            if len(lines) == 4:
+                yield "".join(lines)
+                lines = []
+        if lines:
+            raise ValueError(f"Truncated fastq record: {lines[0].strip()}")
+        return
+    lines = [first]
+    for line in in_file:
+        if line.startswith(">"):
+            yield "".join(lines)
+            lines = []
+        lines.append(line)
+    yield "".join(lines)
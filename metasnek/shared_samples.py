@@ -0,0 +1,118 @@
+"""Shared-memory sample tables for multi-process consumers
+
+A samples dictionary is packed once into the binary manifest layout (see manifest.py) and
+published in a multiprocessing.shared_memory block. Workers attach by name and look
+samples up directly in the shared buffer, so only the block name is sent to each task
+and per-worker memory does not grow with the number of samples.
+"""
+import sys
+import threading
+from multiprocessing import shared_memory, resource_tracker
+
+from metasnek.manifest import Manifest, pack_manifest
+
+
+_attach_lock = threading.Lock()
+
+
+def _attach_untracked(name):
+    """Attach to an existing shared memory block without registering it for cleanup.
+
+    Only the publisher owns (and unlinks) the block, so attaching workers must not
+    register it with the resource tracker, or it would be removed when they exit.
+    """
+
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    with _attach_lock:
+        register = resource_tracker.register
+        resource_tracker.register = lambda *args, **kwargs: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+class SharedSampleTable(Manifest):
+    """Read-only samples (or fastas) table held in shared memory
+
+    Supports the same lookups as Manifest. Create with publish_samples() in the parent
+    process and attach_samples() in workers.
+
+    Args:
+        shm (SharedMemory): shared memory block holding a packed manifest
+        owner (bool): unlink the block on close
+    """
+
+    def __init__(self, shm, owner=False):
+        self.name = shm.name
+        self.manifest_file = shm.name
+        self._shm = shm
+        self._owner = owner
+        self._init_from_buffer(shm.buf)
+
+    def close(self):
+        """Detach from the shared memory block, and unlink it if this is the publisher
+
+        Returns:
+            None
+        """
+
+        if self._shm is None:
+            return
+        self._buffer = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+        self._shm = None
+
+
+def publish_samples(samples, name=None):
+    """Publish a samples dictionary in shared memory
+
+    Args:
+        samples (dict): samples dictionary from parse_samples_to_dictionary() (or a fastas dictionary)
+        name (str): name of the shared memory block (default: generated)
+
+    Returns:
+        SharedSampleTable: owning table; pass table.name to workers, and close() it when done
+    """
+
+    packed = pack_manifest(samples)
+    shm = shared_memory.SharedMemory(name=name, create=True, size=len(packed))
+    shm.buf[: len(packed)] = packed
+    return SharedSampleTable(shm, owner=True)
+
+
+def attach_samples(name):
+    """Attach read-only to a samples table published by publish_samples()
+
+    Args:
+        name (str): name of the shared memory block
+
+    Returns:
+        SharedSampleTable: attached table; close() it when done
+    """
+
+    return SharedSampleTable(_attach_untracked(name))
+
+
+_attached = {}
+
+
+def attached_samples(name):
+    """Get this process's attachment to a published samples table, attaching on first use.
+
+    Intended for worker tasks that receive only the table name, so each worker process
+    attaches once however many tasks it runs.
+
+    Args:
+        name (str): name of the shared memory block
+
+    Returns:
+        SharedSampleTable: attached table, kept open for the life of the process
+    """
+
+    if name not in _attached:
+        _attached[name] = attach_samples(name)
+    return _attached[name]
@@ -0,0 +1,444 @@
+"""MinHash sketching of samples and genomes
+
+Each FASTQ/FASTA file (optionally compressed) is streamed once. Canonical k-mers are
+2-bit encoded with a rolling forward/reverse-complement update over the raw sequence
+bytes, mixed with a 64-bit finaliser, and the bottom-k hashes are kept. File sketches
+are computed in a process pool, cached per file fingerprint, and merged per sample.
+When numpy is installed, the k-mers of each sequence are encoded and hashed in bulk;
+otherwise a pure-Python rolling loop gives identical sketches.
+"""
+
+import os
+import json
+import heapq
+import hashlib
+import concurrent.futures
+
+from metasnek.fastq_finder import has_reads_file
+from metasnek.seqio import open_sequence_file
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MASK64 = 0xFFFFFFFFFFFFFFFF
+
+_ENCODE = bytes.maketrans(b"ACGTacgt", b"\x00\x01\x02\x03\x00\x01\x02\x03")
+
+# bases read at a time from long records, and k-mers hashed per numpy block
+SEQUENCE_PIECE_SIZE = 1048576
+NUMPY_BLOCK_SIZE = 262144
+
+
+def _sequence_pieces(filepath):
+    """Yield the sequences of a fasta or fastq file as bytes, in pieces of about
+    SEQUENCE_PIECE_SIZE bases
+
+    Long fasta records are split into several pieces, so whole chromosomes are never
+    held in memory.
+
+    Yields:
+        tuple: (piece (bytes), first (bool): piece starts a new record)
+    """
+
+    piece_size = SEQUENCE_PIECE_SIZE
+    with open_sequence_file(filepath) as in_file:
+        first = in_file.readline()
+        if first.startswith("@"):
+            line_number = 0
+            for line in in_file:
+                line_number += 1
+                if line_number % 4 == 1:
+                    yield line.rstrip().encode(), True
+            return
+        lines = [] if first.startswith(">") or not first else [first.rstrip()]
+        size = sum(len(line) for line in lines)
+        new_record = True
+        for line in in_file:
+            if line.startswith(">"):
+                if lines:
+                    yield "".join(lines).encode(), new_record
+                lines = []
+                size = 0
+                new_record = True
+                continue
+            line = line.rstrip()
+            lines.append(line)
+            size += len(line)
+            if size >= piece_size:
+                yield "".join(lines).encode(), new_record
+                lines = []
+                size = 0
+                new_record = False
+        if lines:
+            yield "".join(lines).encode(), new_record
+
+
+def _add_hashes_python(sequence, k, seed, sketch_size, heap, seen):
+    """Add the canonical k-mer hashes of one sequence to a bottom-k sketch, one base at a time
+
+    heap holds the negated hashes of the sketch so heap[0] is the largest kept hash.
+    """
+
+    mask = (1 << (2 * k)) - 1
+    shift = 2 * (k - 1)
+    forward = 0
+    reverse = 0
+    length = 0
+    for code in sequence.translate(_ENCODE):
+        if code > 3:
+            length = 0
+            forward = 0
+            reverse = 0
+            continue
+        forward = ((forward << 2) | code) & mask
+        reverse = (reverse >> 2) | ((3 - code) << shift)
+        length += 1
+        if length < k:
+            continue
+        # murmur3 fmix64 of the canonical k-mer
+        h = (forward if forward < reverse else reverse) ^ seed
+        h ^= h >> 33
+        h = (h * 0xFF51AFD7ED558CCD) & MASK64
+        h ^= h >> 33
+        h = (h * 0xC4CEB9FE1A85EC53) & MASK64
+        h ^= h >> 33
+        if len(heap) < sketch_size:
+            if h not in seen:
+                seen.add(h)
+                heapq.heappush(heap, -h)
+        elif h < -heap[0] and h not in seen:
+            seen.add(h)
+            seen.discard(-heapq.heappushpop(heap, -h))
+
+
+def _push_hashes(hashes, sketch_size, heap, seen):
+    """Add ascending hashes to a bottom-k sketch, see _add_hashes_python()"""
+
+    for h in hashes:
+        if len(heap) < sketch_size:
+            if h not in seen:
+                seen.add(h)
+                heapq.heappush(heap, -h)
+        elif h >= -heap[0]:
+            break
+        elif h not in seen:
+            seen.add(h)
+            seen.discard(-heapq.heappushpop(heap, -h))
+
+
+def _add_hashes_numpy(sequence, k, seed, sketch_size, heap, seen):
+    """Add the canonical k-mer hashes of one sequence to a bottom-k sketch with numpy
+
+    Gives the same sketch as _add_hashes_python(). The sequence is processed in blocks of
+    NUMPY_BLOCK_SIZE k-mers, and arrays are only built for the bases of the current
+    block: windows containing a non-ACGT base are masked out, forward
+    and reverse-complement codes are built with one shift per k-mer position, and only
+    the smallest distinct hashes of each block are pushed onto the heap.
+    """
+
+    n_kmers = len(sequence) - k + 1
+    two = np.uint64(2)
+    for start in range(0, n_kmers, NUMPY_BLOCK_SIZE):
+        end = min(start + NUMPY_BLOCK_SIZE, n_kmers)
+        codes = np.frombuffer(
+            sequence[start : end + k - 1].translate(_ENCODE), dtype=np.uint8
+        )
+        invalid = np.concatenate(([0], np.cumsum(codes > 3, dtype=np.int32)))
+        valid = invalid[k:] == invalid[: end - start]
+        if not valid.any():
+            continue
+        codes = np.where(codes > 3, 0, codes).astype(np.uint64)
+        complements = np.uint64(3) - codes
+        forward = np.zeros(end - start, dtype=np.uint64)
+        reverse = np.zeros(end - start, dtype=np.uint64)
+        for i in range(k):
+            forward = (forward << two) | codes[i : i + end - start]
+            reverse |= complements[i : i + end - start] << np.uint64(2 * i)
+        # murmur3 fmix64 of the canonical k-mers, wrapping at 64 bits
+        h = np.minimum(forward, reverse)[valid] ^ np.uint64(seed)
+        h ^= h >> np.uint64(33)
+        h *= np.uint64(0xFF51AFD7ED558CCD)
+        h ^= h >> np.uint64(33)
+        h *= np.uint64(0xC4CEB9FE1A85EC53)
+        h ^= h >> np.uint64(33)
+        _push_hashes(np.unique(h)[:sketch_size].tolist(), sketch_size, heap, seen)
+
+
+def _add_hashes(sequence, k, seed, sketch_size, heap, seen):
+    """Add the canonical k-mer hashes of one sequence to a bottom-k sketch
+
+    Uses numpy when it is installed (and the seed fits in 64 bits), otherwise the
+    pure-Python loop.
+    """
+
+    if np is not None and 0 <= seed <= MASK64:
+        _add_hashes_numpy(sequence, k, seed, sketch_size, heap, seen)
+    else:
+        _add_hashes_python(sequence, k, seed, sketch_size, heap, seen)
+
+
+def sketch_file(filepath, k=21, sketch_size=1000, seed=42):
+    """Build a bottom-k MinHash sketch of the canonical k-mers of a fasta/fastq file
+
+    Args:
+        filepath (str): filepath of (optionally compressed) fasta or fastq file
+        k (int): k-mer size, 1-32
+        sketch_size (int): number of hashes to keep
+        seed (int): hash seed
+
+    Returns:
+        sketch (list): sorted list of the smallest k-mer hashes
+    """
+
+    if not 1 <= k <= 32:
+        raise ValueError(f"k must be between 1 and 32, got {k}")
+
+    heap = []
+    seen = set()
+    overlap = b""
+    for piece, first in _sequence_pieces(filepath):
+        # carry the last k - 1 bases over so k-mers spanning two pieces are hashed once
+        sequence = piece if first else overlap + piece
+        _add_hashes(sequence, k, seed, sketch_size, heap, seen)
+        overlap = sequence[len(sequence) - k + 1 :] if k > 1 else b""
+    return sorted(-h for h in heap)
+
+
+def merge_sketches(sketches, sketch_size=1000):
+    """Merge bottom-k sketches into the bottom-k sketch of their union
+
+    Args:
+        sketches (list): sketches from sketch_file()
+        sketch_size (int): number of hashes to keep
+
+    Returns:
+        sketch (list): sorted list of the smallest hashes
+    """
+
+    return heapq.nsmallest(sketch_size, set().union(*sketches))
+
+
+def _cache_path(cache_dir, filepath, k, sketch_size, seed):
+    """Cache file for a sketch, keyed on the file fingerprint and sketch parameters"""
+
+    file_stat = os.stat(filepath)
+    key = "\t".join(
+        str(v)
+        for v in (
+            os.path.abspath(filepath),
+            file_stat.st_size,
+            file_stat.st_mtime_ns,
+            k,
+            sketch_size,
+            seed,
+        )
+    )
+    return os.path.join(
+        cache_dir, hashlib.blake2b(key.encode(), digest_size=16).hexdigest() + ".json"
+    )
+
+
+def sketch_files(
+    filepaths, k=21, sketch_size=1000, seed=42, processes=None, cache_dir=None
+):
+    """Sketch many files in a process pool, reusing cached sketches of unchanged files
+
+    Args:
+        filepaths (list): filepaths of fasta/fastq files
+        k (int): k-mer size, 1-32
+        sketch_size (int): number of hashes to keep
+        seed (int): hash seed
+        processes (int): number of worker processes (default: CPU count, 1 runs in-process)
+        cache_dir (str): directory for caching sketches per file fingerprint
+
+    Returns:
+        sketches (dict):
+            key (str): filepath
+            value (list): sketch
+    """
+
+    sketches = {}
+    to_sketch = []
+    for filepath in dict.fromkeys(filepaths):
+        if cache_dir is not None:
+            cache_file = _cache_path(cache_dir, filepath, k, sketch_size, seed)
+            if os.path.isfile(cache_file):
+                with open(cache_file, "r") as in_cache:
+                    sketches[filepath] = json.load(in_cache)
+                continue
+        to_sketch.append(filepath)
+
+    if processes == 1:
+        results = [sketch_file(f, k, sketch_size, seed) for f in to_sketch]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+            results = list(
+                executor.map(
+                    sketch_file,
+                    to_sketch,
+                    [k] * len(to_sketch),
+                    [sketch_size] * len(to_sketch),
+                    [seed] * len(to_sketch),
+                )
+            )
+
+    for filepath, sketch in zip(to_sketch, results):
+        sketches[filepath] = sketch
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            cache_file = _cache_path(cache_dir, filepath, k, sketch_size, seed)
+            with open(cache_file, "w") as out_cache:
+                json.dump(sketch, out_cache)
+
+    return sketches
+
+
+def sketch_samples(
+    samples, k=21, sketch_size=1000, seed=42, processes=None, cache_dir=None
+):
+    """Sketch every sample of a samples dictionary, merging the R1, R2 and S files
+
+    Args:
+        samples (dict): samples dictionary from parse_samples_to_dictionary()
+        k, sketch_size, seed, processes, cache_dir: see sketch_files()
+
+    Returns:
+        sketches (dict):
+            key (str): sample name
+            value (list): sketch
+    """
+
+    filepaths = [
+        filepath
+        for reads in samples.values()
+        for filepath in (reads.get("R1"), reads.get("R2"), reads.get("S"))
+        if has_reads_file(filepath)
+    ]
+    file_sketches = sketch_files(filepaths, k, sketch_size, seed, processes, cache_dir)
+    return {
+        sample: merge_sketches(
+            [
+                file_sketches[reads[key]]
+                for key in ("R1", "R2", "S")
+                if has_reads_file(reads.get(key))
+            ],
+            sketch_size,
+        )
+        for sample, reads in samples.items()
+    }
+
+
+def sketch_fastas(
+    fasta_dict, k=21, sketch_size=1000, seed=42, processes=None, cache_dir=None
+):
+    """Sketch every genome of a fastas dictionary
+
+    Args:
+        fasta_dict (dict): fastas dictionary from parse_fastas()
+        k, sketch_size, seed, processes, cache_dir: see sketch_files()
+
+    Returns:
+        sketches (dict):
+            key (str): ref name
+            value (list): sketch
+    """
+
+    file_sketches = sketch_files(
+        fasta_dict.values(), k, sketch_size, seed, processes, cache_dir
+    )
+    return {
+        ref_name: file_sketches[filepath] for ref_name, filepath in fasta_dict.items()
+    }
+
+
+def jaccard(sketch_a, sketch_b, sketch_size=1000):
+    """Estimate the Jaccard similarity of two sketches
+
+    Args:
+        sketch_a (list): sketch
+        sketch_b (list): sketch
+        sketch_size (int): sketch size used to build the sketches
+
+    Returns:
+        float: estimated Jaccard similarity
+    """
+
+    union = merge_sketches([sketch_a, sketch_b], sketch_size)
+    if not union:
+        return 0.0
+    set_a = set(sketch_a)
+    set_b = set(sketch_b)
+    return sum(1 for h in union if h in set_a and h in set_b) / len(union)
+
+
+def containment(sketch_a, sketch_b):
+    """Estimate the fraction of the k-mers of a that are contained in b
+
+    Only the hashes of a within the range covered by b's sketch are compared.
+
+    Args:
+        sketch_a (list): sketch
+        sketch_b (list): sketch
+
+    Returns:
+        float: estimated containment of a in b
+    """
+
+    if not sketch_a or not sketch_b:
+        return 0.0
+    max_b = max(sketch_b)
+    set_b = set(sketch_b)
+    comparable = [h for h in sketch_a if h <= max_b]
+    if not comparable:
+        return 0.0
+    return sum(1 for h in comparable if h in set_b) / len(comparable)
+
+
+def compare_sketches(sketches, metric="jaccard", sketch_size=1000):
+    """All-vs-all comparison of sketches
+
+    Args:
+        sketches (dict): sketches keyed by sample or ref name
+        metric (str): "jaccard", or "containment" (row contained in column)
+        sketch_size (int): sketch size used to build the sketches
+
+    Returns:
+        tuple: A tuple containing:
+            - names (list): sample/ref names in matrix order
+            - matrix (list): list of rows of similarities
+    """
+
+    if metric not in ("jaccard", "containment"):
+        raise ValueError(f"Unsupported metric: {metric}")
+
+    names = list(sketches)
+    matrix = []
+    for name_a in names:
+        row = []
+        for name_b in names:
+            if metric == "jaccard":
+                row.append(jaccard(sketches[name_a], sketches[name_b], sketch_size))
+            else:
+                row.append(containment(sketches[name_a], sketches[name_b]))
+        matrix.append(row)
+    return names, matrix
+
+
+def write_similarity_matrix(names, matrix, output_file):
+    """Write a similarity matrix to a TSV file with a header row of names
+
+    Args:
+        names (list): sample/ref names in matrix order
+        matrix (list): list of rows of similarities
+        output_file (str): filepath of output file for writing
+
+    Returns:
+        None
+    """
+
+    with open(output_file, "w") as out:
+        out.write("\t" + "\t".join(names) + "\n")
+        for name, row in zip(names, matrix):
+            out.write(name + "\t" + "\t".join(f"{value:.6f}" for value in row) + "\n")
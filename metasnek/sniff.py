@@ -0,0 +1,310 @@
+"""Quick format sniffing of discovered sequence files
+
+Only the first and last few KB of each file are read: the head (decompressed if needed)
+is used to detect the format, quality encoding and line endings, and the tail to check
+for truncation where the format allows it, ie. a missing BGZF EOF block or a missing
+final newline in uncompressed files. Truncated plain gzip files can only be detected by
+decompressing them in full, which is opt-in (verify_gzip). Files are sniffed in a thread
+pool and results are cached per file fingerprint.
+"""
+import os
+import re
+import json
+import zlib
+import itertools
+import warnings
+import threading
+import concurrent.futures
+
+from metasnek.bgzf import BGZF_EOF
+from metasnek.seqio import detect_compression, strip_compression_extension
+
+
+FASTQ_NAME_PATTERN = r"\.(fastq|fq)$"
+FASTA_NAME_PATTERN = r"\.(fasta|fa|fna|ffn|faa|frn)$"
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _fingerprint(filepath):
+    """Cache key of a file: absolute path, size and mtime"""
+
+    file_stat = os.stat(filepath)
+    return f"{os.path.abspath(filepath)}\t{file_stat.st_size}\t{file_stat.st_mtime_ns}"
+
+
+def _expected_format(filepath):
+    """Format implied by a file's extension, or None"""
+
+    file_name = strip_compression_extension(os.path.basename(filepath))
+    if re.search(FASTQ_NAME_PATTERN, file_name, re.IGNORECASE):
+        return "fastq"
+    if re.search(FASTA_NAME_PATTERN, file_name, re.IGNORECASE):
+        return "fasta"
+    return None
+
+
+def _decompress_head(head, compression):
+    """Decompress as much as possible of the first bytes of a compressed file"""
+
+    if compression in ("gzip", "bgzf"):
+        decompressor = zlib.decompressobj(31)
+        try:
+            return decompressor.decompress(head)
+        except zlib.error:
+            return None
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            return b""
+        try:
+            return zstandard.ZstdDecompressor().decompressobj().decompress(head)
+        except zstandard.ZstdError:
+            return None
+    return head
+
+
+def _gzip_complete(filepath, block_size=1048576):
+    """Decompress a whole (multi-member) gzip file, checking every member's CRC and length"""
+
+    decompressor = zlib.decompressobj(31)
+    with open(filepath, "rb") as in_file:
+        for block in iter(lambda: in_file.read(block_size), b""):
+            while block:
+                if decompressor.eof:
+                    decompressor = zlib.decompressobj(31)
+                try:
+                    decompressor.decompress(block)
+                except zlib.error:
+                    return False
+                block = decompressor.unused_data
+    return decompressor.eof
+
+
+def _quality_encoding(quality_lines):
+    """Guess the quality encoding from the quality lines of some fastq records"""
+
+    characters = "".join(quality_lines)
+    if not characters:
+        return None
+    lowest = min(ord(c) for c in characters)
+    if lowest < 59:
+        return "phred33"
+    if lowest >= 64 and max(ord(c) for c in characters) > 74:
+        return "phred64"
+    return "phred33"
+
+
+def _sniff_text(text, problems):
+    """Detect the format of the decoded head of a file, checking the first fastq records"""
+
+    if text.startswith(">"):
+        return "fasta", None
+    if not text.startswith("@"):
+        problems.append("not fasta or fastq")
+        return "unknown", None
+
+    lines = text.split("\n")
+    # the last line may be cut off part way through
+    complete = len(lines) - 1
+    quality_lines = []
+    for start in range(0, complete - complete % 4, 4):
+        header, sequence, separator, quality = (
+            line.rstrip("\r") for line in lines[start : start + 4]
+        )
+        if not header.startswith("@") or not separator.startswith("+"):
+            problems.append(f"malformed fastq record at line {start + 1}")
+            break
+        if len(sequence) != len(quality):
+            problems.append(f"sequence and quality lengths differ at line {start + 1}")
+            break
+        quality_lines.append(quality)
+    return "fastq", _quality_encoding(quality_lines)
+
+
+def sniff_file(filepath, head_bytes=4096, tail_bytes=4096, verify_gzip=False):
+    """Sniff the format of a sequence file from its first and last few KB
+
+    Args:
+        filepath (str): filepath of sequence file
+        head_bytes (int): bytes read from the start of the file
+        tail_bytes (int): bytes read from the end of the file
+        verify_gzip (bool): decompress gzip/BGZF files in full to check they are complete
+
+    Returns:
+        dict:
+            - path (str): filepath
+            - format (str): "fasta", "fastq", "unknown", or "empty"
+            - compression (str): "gzip", "bgzf", "zstd", or None
+            - quality_encoding (str): "phred33", "phred64", or None
+            - problems (list): descriptions of any problems found
+            - notes (list): checks that could not be made, eg. gzip truncation without verify_gzip
+    """
+
+    result = {
+        "path": filepath,
+        "format": "empty",
+        "compression": None,
+        "quality_encoding": None,
+        "problems": [],
+        "notes": [],
+    }
+    problems = result["problems"]
+
+    size = os.path.getsize(filepath)
+    if size == 0:
+        problems.append("empty file")
+        return result
+
+    compression = detect_compression(filepath)
+    result["compression"] = compression
+    with open(filepath, "rb") as in_file:
+        head = in_file.read(head_bytes)
+        in_file.seek(max(0, size - tail_bytes))
+        tail = in_file.read()
+
+    if compression == "bgzf" and not tail.endswith(BGZF_EOF):
+        problems.append("missing BGZF EOF block, file may be truncated")
+    elif compression == "gzip" and size < 20:
+        problems.append("gzip file too short, file may be truncated")
+    elif compression is None and not tail.endswith(b"\n"):
+        problems.append("no final newline, file may be truncated")
+    elif compression == "gzip" and not verify_gzip:
+        result["notes"].append("gzip truncation not checked")
+    if (
+        verify_gzip
+        and compression in ("gzip", "bgzf")
+        and not problems
+        and not _gzip_complete(filepath)
+    ):
+        problems.append(f"incomplete or corrupt {compression} stream")
+
+    data = _decompress_head(head, compression)
+    if data is None:
+        problems.append(f"corrupt {compression} data")
+        result["format"] = "unknown"
+        return result
+    if not data:
+        if compression == "zstd":
+            problems.append("zstd sniffing requires the zstandard package")
+            result["format"] = "unknown"
+        else:
+            problems.append("no data")
+        return result
+
+    if b"\r\n" in data:
+        problems.append("Windows (CRLF) line endings")
+
+    result["format"], result["quality_encoding"] = _sniff_text(
+        data.decode(errors="replace"), problems
+    )
+
+    expected = _expected_format(filepath)
+    if (
+        expected
+        and result["format"] in ("fasta", "fastq")
+        and result["format"] != expected
+    ):
+        problems.append(f"{result['format']} content in a {expected}-named file")
+
+    return result
+
+
+def _load_cache(cache_file):
+    """Load a JSON sniff cache into the in-memory cache"""
+
+    if cache_file and os.path.isfile(cache_file):
+        with open(cache_file, "r") as in_cache:
+            with _cache_lock:
+                _cache.update(json.load(in_cache))
+
+
+def _save_cache(cache_file, keys):
+    """Write the cached results for keys to a JSON sniff cache"""
+
+    if not cache_file:
+        return
+    saved = {}
+    if os.path.isfile(cache_file):
+        with open(cache_file, "r") as in_cache:
+            saved = json.load(in_cache)
+    with _cache_lock:
+        saved.update({key: _cache[key] for key in keys if key in _cache})
+    tmp_file = cache_file + ".tmp"
+    with open(tmp_file, "w") as out_cache:
+        json.dump(saved, out_cache)
+    os.replace(tmp_file, cache_file)
+
+
+def _sniff_cached(filepath, verify_gzip=False):
+    """Sniff a file, reusing the cached result if its fingerprint is unchanged"""
+
+    key = _fingerprint(filepath) + ("\tverify_gzip" if verify_gzip else "")
+    with _cache_lock:
+        if key in _cache:
+            return key, dict(_cache[key], path=filepath)
+    result = sniff_file(filepath, verify_gzip=verify_gzip)
+    with _cache_lock:
+        _cache[key] = result
+    return key, result
+
+
+def sniff_files(filepaths, threads=8, cache_file=None, verify_gzip=False):
+    """Sniff many sequence files in a thread pool
+
+    Args:
+        filepaths (list): filepaths of sequence files
+        threads (int): number of threads
+        cache_file (str): JSON file for persisting results between runs, keyed on file fingerprint
+        verify_gzip (bool): decompress gzip/BGZF files in full, see sniff_file()
+
+    Returns:
+        results (dict):
+            key (str): filepath
+            value (dict): sniff result, see sniff_file()
+    """
+
+    _load_cache(cache_file)
+    filepaths = list(dict.fromkeys(filepaths))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        keyed = list(
+            executor.map(
+                _sniff_cached, filepaths, itertools.repeat(verify_gzip, len(filepaths))
+            )
+        )
+    _save_cache(cache_file, [key for key, _ in keyed])
+    return {filepath: result for filepath, (_, result) in zip(filepaths, keyed)}
+
+
+def filter_sniffed(filepaths, action, threads=8, cache_file=None, verify_gzip=False):
+    """Sniff files and drop, or warn about, those with problems
+
+    Args:
+        filepaths (list): filepaths of sequence files
+        action (str): "drop" to remove files with problems, or "flag" to keep them with a warning
+        threads (int): number of threads
+        cache_file (str): JSON sniff cache, see sniff_files()
+        verify_gzip (bool): decompress gzip/BGZF files in full, see sniff_file()
+
+    Returns:
+        filepaths (list): filepaths to keep, in their original order
+    """
+
+    if action not in ("drop", "flag"):
+        raise ValueError(f"Unsupported sniff action: {action}")
+
+    results = sniff_files(filepaths, threads, cache_file, verify_gzip)
+    kept = []
+    for filepath in filepaths:
+        problems = results[filepath]["problems"]
+        if problems:
+            warnings.warn(
+                f"{'Dropping' if action == 'drop' else 'Problem with'} {filepath}: {'; '.join(problems)}",
+                Warning,
+            )
+            if action == "drop":
+                continue
+        kept.append(filepath)
+    return kept
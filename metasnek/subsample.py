@@ -0,0 +1,217 @@
+"""Paired-aware streaming subsampling of reads files
+
+R1 and R2 are read in lockstep so kept pairs stay synchronised. Fraction mode keeps each
+record (or pair) with a seeded probability in a single pass. Count mode runs reservoir
+sampling over record numbers in a first pass, so memory is bounded by the number of reads
+kept rather than their text, then writes the chosen records in a second pass.
+"""
+import os
+import re
+import random
+import itertools
+import contextlib
+import concurrent.futures
+
+from metasnek.bgzf import BgzfWriter
+from metasnek.fastq_finder import has_reads_file
+from metasnek.seqio import open_sequence_file, iter_records, strip_compression_extension
+
+
+SEQUENCE_EXTENSION_PATTERN = r"\.(fastq|fq|fasta|fa|fna|ffn|faa|frn)$"
+
+
+def _iter_lockstep(in_files):
+    """Iterate tuples of records from one or more files in lockstep"""
+
+    iterators = [iter_records(in_file) for in_file in in_files]
+    for records in itertools.zip_longest(*iterators):
+        if None in records:
+            raise ValueError("Paired reads files have different numbers of records")
+        yield records
+
+
+def _open_output(filepath, compress, threads):
+    """Open a reads file for writing, BGZF-compressed if requested"""
+
+    if compress:
+        return BgzfWriter(filepath, threads=threads, index=False)
+    return open(filepath, "w", buffering=1048576)
+
+
+def _reservoir(in_files, count, rng):
+    """Choose count record numbers uniformly at random with reservoir sampling"""
+
+    reservoir = []
+    for i, _ in enumerate(_iter_lockstep(in_files)):
+        if i < count:
+            reservoir.append(i)
+        else:
+            j = rng.randint(0, i)
+            if j < count:
+                reservoir[j] = i
+    return set(reservoir)
+
+
+def subsample_reads(
+    in_files, out_files, fraction=None, count=None, seed=42, compress=False, threads=1
+):
+    """Subsample one reads file, or a pair of reads files in lockstep
+
+    Args:
+        in_files (list): filepaths of reads files to subsample together (eg. [R1, R2])
+        out_files (list): filepaths of subsampled reads files for writing
+        fraction (float): keep each record/pair with this probability
+        count (int): keep exactly this many records/pairs (or all of them if there are fewer)
+        seed (int or str): random seed
+        compress (bool): write BGZF-compressed output
+        threads (int): compression threads per output file
+
+    Returns:
+        kept (int): number of records/pairs written
+    """
+
+    if (fraction is None) == (count is None):
+        raise ValueError("Specify exactly one of fraction or count")
+    if fraction is not None and not 0 <= fraction <= 1:
+        raise ValueError(f"fraction must be between 0 and 1, got {fraction}")
+    if count is not None and count < 0:
+        raise ValueError(f"count must not be negative, got {count}")
+    for out_file in out_files:
+        for in_file in in_files:
+            if os.path.abspath(out_file) == os.path.abspath(in_file) or (
+                os.path.exists(out_file) and os.path.samefile(out_file, in_file)
+            ):
+                raise ValueError(
+                    f"Output file {out_file} would overwrite input file {in_file}"
+                )
+
+    rng = random.Random(seed)
+
+    chosen = None
+    if count is not None:
+        in_handles = [open_sequence_file(f) for f in in_files]
+        try:
+            chosen = _reservoir(in_handles, count, rng)
+        finally:
+            for handle in in_handles:
+                handle.close()
+
+    kept = 0
+    with contextlib.ExitStack() as stack:
+        in_handles = [stack.enter_context(open_sequence_file(f)) for f in in_files]
+        out_handles = [
+            stack.enter_context(_open_output(f, compress, threads)) for f in out_files
+        ]
+        for i, records in enumerate(_iter_lockstep(in_handles)):
+            if chosen is not None:
+                keep = i in chosen
+            else:
+                keep = rng.random() < fraction
+            if keep:
+                for out_handle, record in zip(out_handles, records):
+                    out_handle.write(record)
+                kept += 1
+
+    return kept
+
+
+def _output_path(sample, key, filepath, output_dir, compress):
+    """Output filepath for a subsampled reads file, named after the sample and read key
+    so that inputs with the same basename in different directories cannot collide"""
+
+    file_name = strip_compression_extension(os.path.basename(filepath))
+    extension = re.search(SEQUENCE_EXTENSION_PATTERN, file_name, re.IGNORECASE)
+    extension = extension.group(0) if extension else ".fastq"
+    return os.path.join(
+        output_dir, f"{sample}_{key}{extension}" + (".gz" if compress else "")
+    )
+
+
+def subsample_sample(
+    sample,
+    reads,
+    output_dir,
+    fraction=None,
+    count=None,
+    seed=42,
+    compress=False,
+    threads=1,
+):
+    """Subsample the R1/R2 pair and the singletons of one sample
+
+    Args:
+        sample (str): sample name, combined with seed so each sample gets its own random stream
+        reads (dict): R1, R2 and S filepaths of the sample (R2/S may be None)
+        output_dir (str): directory for subsampled reads files, named sample_R1.fastq etc.
+        fraction, count, seed, compress, threads: see subsample_reads()
+
+    Returns:
+        reads (dict): R1, R2 and S filepaths of the subsampled reads
+    """
+
+    out_reads = {"R1": None, "R2": None, "S": None}
+    paired = [reads["R1"]] + ([reads["R2"]] if has_reads_file(reads.get("R2")) else [])
+    out_paired = [
+        _output_path(sample, key, f, output_dir, compress)
+        for key, f in zip(("R1", "R2"), paired)
+    ]
+    subsample_reads(
+        paired, out_paired, fraction, count, f"{seed}:{sample}", compress, threads
+    )
+    out_reads["R1"] = out_paired[0]
+    if len(out_paired) == 2:
+        out_reads["R2"] = out_paired[1]
+
+    if has_reads_file(reads.get("S")):
+        out_reads["S"] = _output_path(sample, "S", reads["S"], output_dir, compress)
+        subsample_reads(
+            [reads["S"]],
+            [out_reads["S"]],
+            fraction,
+            count,
+            f"{seed}:{sample}:S",
+            compress,
+            threads,
+        )
+
+    return out_reads
+
+
+def subsample_samples(
+    samples,
+    output_dir,
+    fraction=None,
+    count=None,
+    seed=42,
+    processes=None,
+    compress=False,
+):
+    """Subsample every sample of a samples dictionary in parallel
+
+    Args:
+        samples (dict): samples dictionary from parse_samples_to_dictionary()
+        output_dir (str): directory for subsampled reads files
+        fraction (float): keep each record/pair with this probability
+        count (int): keep this many records/pairs per sample
+        seed (int): random seed
+        processes (int): number of worker processes (default: CPU count, 1 runs in-process)
+        compress (bool): write BGZF-compressed output
+
+    Returns:
+        dict: samples dictionary of the subsampled reads files, eg. for write_samples_tsv()
+    """
+
+    os.makedirs(output_dir, exist_ok=True)
+    args = [
+        (sample, reads, output_dir, fraction, count, seed, compress)
+        for sample, reads in samples.items()
+    ]
+
+    if processes == 1:
+        results = [subsample_sample(*a) for a in args]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = [executor.submit(subsample_sample, *a) for a in args]
+            results = [future.result() for future in futures]
+
+    return dict(zip(samples.keys(), results))
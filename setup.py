@@ -37,4 +37,7 @@ setup(
     version=get_version(),
     author="Michael Roach",
     author_email="beardymcjohnface@gmail.com",
+    packages=["metasnek"],
+    extras_require={"sketch": ["numpy"]},
+    entry_points={"console_scripts": ["metasnek=metasnek.cli:main"]},
 )
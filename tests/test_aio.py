@@ -0,0 +1,75 @@
+import os
+import asyncio
+import pytest
+
+from metasnek.aio import AsyncScanner
+from metasnek.fastq_finder import parse_samples, parse_samples_to_dictionary
+from metasnek.fasta_finder import parse_fastas
+
+
+@pytest.fixture
+def reads_directories(tmpdir):
+    directories = []
+    for project in range(3):
+        project_dir = tmpdir.mkdir(f"project{project}")
+        for file_name in ["s1_R1.fastq", "s1_R2.fastq", "s2.fastq.gz", "s3.fasta"]:
+            project_dir.join(f"p{project}{file_name}").write("")
+        directories.append(str(project_dir))
+    return directories
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_async_parse_samples(reads_directories):
+    async def scan():
+        async with AsyncScanner(max_workers=2, max_concurrency=2) as scanner:
+            return await scanner.parse_samples(reads_directories[0])
+
+    assert run(scan()) == parse_samples(reads_directories[0])
+
+
+def test_async_scan_samples(reads_directories, tmpdir):
+    async def scan(inputs):
+        async with AsyncScanner(max_workers=4) as scanner:
+            return await scanner.scan_samples(inputs, return_exceptions=True)
+
+    missing = str(tmpdir.join("missing"))
+    results = run(scan(reads_directories + [missing]))
+    for directory in reads_directories:
+        assert results[directory] == parse_samples_to_dictionary(directory)
+    assert isinstance(results[missing], ValueError)
+
+
+def test_async_parse_tsv_file(reads_directories, tmpdir):
+    r1_file = os.path.join(reads_directories[0], "p0s1_R1.fastq")
+    r2_file = os.path.join(reads_directories[0], "p0s1_R2.fastq")
+    tsv_file = tmpdir.join("samples.tsv")
+    tsv_file.write(f"s1\t{r1_file}\t{r2_file}\ns2\t{r1_file}\n")
+
+    async def parse(filepath):
+        async with AsyncScanner() as scanner:
+            return await scanner.parse_samples(filepath)
+
+    assert run(parse(str(tsv_file))) == parse_samples(str(tsv_file))
+
+    tsv_file.write(f"s1\t{r1_file}\tmissing_R2.fastq\n")
+    with pytest.raises(ValueError, match="R2 file 'missing_R2.fastq' does not exist"):
+        run(parse(str(tsv_file)))
+
+    tsv_file.write("s1\t\n")
+    with pytest.raises(ValueError, match="R1 file '' does not exist"):
+        parse_samples(str(tsv_file))
+    with pytest.raises(ValueError, match="R1 file '' does not exist"):
+        run(parse(str(tsv_file)))
+
+
+def test_async_scan_fastas(reads_directories):
+    async def scan():
+        async with AsyncScanner() as scanner:
+            return await scanner.scan_fastas(reads_directories + ["non_existent_path"])
+
+    results = run(scan())
+    assert results[reads_directories[1]] == parse_fastas(reads_directories[1])
+    assert results["non_existent_path"] == {}
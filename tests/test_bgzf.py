@@ -0,0 +1,80 @@
+import os
+import gzip
+import zlib
+import pytest
+
+from metasnek.bgzf import (
+    BLOCK_SIZE,
+    BGZF_EOF,
+    compress_block,
+    BgzfWriter,
+    write_gzi,
+    read_gzi,
+)
+
+
+@pytest.fixture
+def sequence_data():
+    return b"".join(
+        b">seq%d\n" % i + b"ACGTTGCA" * (i % 50 + 1) + b"\n" for i in range(20000)
+    )
+
+
+def test_compress_block():
+    block = compress_block(b"ACGT\n")
+    assert block[:4] == b"\x1f\x8b\x08\x04"
+    assert int.from_bytes(block[16:18], "little") == len(block) - 1
+    assert gzip.decompress(block) == b"ACGT\n"
+
+
+def test_bgzf_writer(tmpdir, sequence_data):
+    out_file = str(tmpdir.join("out.fasta.gz"))
+    with BgzfWriter(out_file) as out:
+        out.write(sequence_data[:1000].decode())
+        out.write(sequence_data[1000:])
+
+    with open(out_file, "rb") as compressed:
+        content = compressed.read()
+    assert content.endswith(BGZF_EOF)
+    assert gzip.decompress(content) == sequence_data
+
+    block_offsets = read_gzi(out_file + ".gzi")
+    assert len(block_offsets) == -(-len(sequence_data) // BLOCK_SIZE)
+    for compressed_offset, uncompressed_offset in block_offsets:
+        decompressor = zlib.decompressobj(31)
+        block = decompressor.decompress(content[compressed_offset:])
+        assert (
+            block
+            == sequence_data[uncompressed_offset : uncompressed_offset + len(block)]
+        )
+
+
+def test_bgzf_writer_threads(tmpdir, sequence_data):
+    single_file = str(tmpdir.join("single.gz"))
+    threaded_file = str(tmpdir.join("threaded.gz"))
+    with BgzfWriter(single_file, index=False) as out:
+        out.write(sequence_data)
+    with BgzfWriter(threaded_file, threads=4, index=False) as out:
+        out.write(sequence_data)
+    assert not os.path.exists(single_file + ".gzi")
+    with open(single_file, "rb") as single, open(threaded_file, "rb") as threaded:
+        assert single.read() == threaded.read()
+
+
+def test_bgzf_writer_exception(tmpdir, sequence_data):
+    out_file = str(tmpdir.join("failed.fasta.gz"))
+    with pytest.raises(RuntimeError):
+        with BgzfWriter(out_file, threads=2) as out:
+            out.write(sequence_data)
+            raise RuntimeError("failed part way")
+    with open(out_file, "rb") as compressed:
+        assert not compressed.read().endswith(BGZF_EOF)
+    assert not os.path.exists(out_file + ".gzi")
+
+
+def test_gzi_roundtrip(tmpdir):
+    index_file = str(tmpdir.join("out.gzi"))
+    block_offsets = [(0, 0), (100, 65280), (210, 130560)]
+    write_gzi(block_offsets, index_file)
+    assert os.path.getsize(index_file) == 8 + 16 * 2
+    assert read_gzi(index_file) == block_offsets
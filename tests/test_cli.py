@@ -0,0 +1,104 @@
+import os
+import sys
+import subprocess
+import pytest
+
+from metasnek.cli import main
+
+
+@pytest.fixture
+def reads_directory(tmpdir):
+    for file_name in ["sample1_R1.fastq", "sample1_R2.fastq", "sample2.fastq"]:
+        tmpdir.join(file_name).write("")
+    return str(tmpdir)
+
+
+@pytest.fixture
+def fasta_directory(tmpdir_factory):
+    fasta_dir = tmpdir_factory.mktemp("fastas")
+    fasta_dir.join("genome1.fasta").write(">seq1\nACGT\n")
+    fasta_dir.join("genome2.fasta").write(">seq2\nTGCA\n")
+    return str(fasta_dir)
+
+
+def test_cli_lazy_imports():
+    code = (
+        "import sys, metasnek.cli; "
+        "print(any(m in sys.modules for m in "
+        "('metasnek.fastq_finder', 'metasnek.fasta_finder', 'concurrent.futures')))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == "False"
+
+    code = (
+        "import sys, metasnek.fastq_finder; "
+        "print(any(m in sys.modules for m in ('metasnek.sniff', 'concurrent.futures')))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == "False"
+
+
+def test_cli_samples(reads_directory, capsys):
+    assert main(["samples", reads_directory]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert lines == [
+        "\t".join(
+            [
+                "sample1",
+                os.path.join(reads_directory, "sample1_R1.fastq"),
+                os.path.join(reads_directory, "sample1_R2.fastq"),
+            ]
+        ),
+        "\t".join(["sample2", os.path.join(reads_directory, "sample2.fastq")]),
+    ]
+
+
+def test_cli_samples_output(reads_directory, tmpdir_factory):
+    output = str(tmpdir_factory.mktemp("out").join("samples.tsv"))
+    assert main(["samples", reads_directory, "-o", output]) == 0
+    with open(output, "r") as tsv_file:
+        assert len(tsv_file.readlines()) == 2
+
+
+def test_cli_samples_missing(capsys):
+    assert main(["samples", "non_existent_path"]) == 1
+    assert "neither a file nor directory" in capsys.readouterr().err
+
+
+def test_cli_fastas(fasta_directory, tmpdir_factory):
+    out_dir = tmpdir_factory.mktemp("out")
+    tsv = str(out_dir.join("fastas.tsv"))
+    combined = str(out_dir.join("combined.fasta"))
+    assert main(["fastas", fasta_directory, "-o", tsv, "-c", combined]) == 0
+    with open(combined, "r") as combined_fasta:
+        assert combined_fasta.read() == (
+            ">genome1.fasta:seq1\nACGT\n>genome2.fasta:seq2\nTGCA\n"
+        )
+
+
+def test_cli_batch(reads_directory, fasta_directory, tmpdir_factory):
+    out_dir = tmpdir_factory.mktemp("out")
+    batch_file = out_dir.join("batch.txt")
+    batch_file.write(
+        f"# comment\n"
+        f"samples {reads_directory} -o {out_dir.join('samples.tsv')}\n"
+        f"fastas {fasta_directory} -o {out_dir.join('fastas.tsv')}\n"
+        f"samples non_existent_path\n"
+    )
+    assert main(["batch", str(batch_file)]) == 1
+    assert os.path.isfile(str(out_dir.join("samples.tsv")))
+    assert os.path.isfile(str(out_dir.join("fastas.tsv")))
+
+
+def test_cli_fastas_filters(fasta_directory, tmpdir_factory):
+    out_dir = tmpdir_factory.mktemp("out")
+    combined = str(out_dir.join("combined.fasta"))
+    name_map = str(out_dir.join("names.tsv"))
+    args = ["fastas", fasta_directory, "-c", combined, "--min-length", "5"]
+    assert main(args + ["--name-map", name_map]) == 0
+    with open(combined, "r") as combined_fasta:
+        assert combined_fasta.read() == ""
@@ -0,0 +1,103 @@
+import os
+import pytest
+
+from metasnek.manifest import Manifest, write_manifest
+from metasnek.delta import (
+    sample_fingerprints,
+    diff_samples,
+    diff_manifest_to_samples,
+    write_sample_changes,
+)
+
+
+@pytest.fixture
+def reads_directory(tmpdir):
+    for file_name in [
+        "s1_R1.fastq",
+        "s1_R2.fastq",
+        "s2_R1.fastq",
+        "s2_R2.fastq",
+        "s3.fastq",
+    ]:
+        tmpdir.join(file_name).write("@read\nACGT\n+\nIIII\n")
+    return tmpdir
+
+
+def samples_for(reads_directory):
+    path = lambda name: str(reads_directory.join(name))
+    return {
+        "s1": {"R1": path("s1_R1.fastq"), "R2": path("s1_R2.fastq"), "S": None},
+        "s2": {"R1": path("s2_R1.fastq"), "R2": path("s2_R2.fastq"), "S": None},
+        "s3": {"R1": path("s3.fastq"), "R2": None, "S": None},
+    }
+
+
+def test_diff_samples_paths(reads_directory):
+    old = samples_for(reads_directory)
+    new = samples_for(reads_directory)
+    del new["s3"]
+    new["s4"] = {"R1": "s4.fastq", "R2": None, "S": None}
+    new["s1"]["S"] = "s1_RS.fastq"
+    changes = diff_samples(old, new)
+    assert changes == [
+        {"sample": "s3", "change": "removed", "paths": [], "contents": []},
+        {"sample": "s1", "change": "modified", "paths": ["S"], "contents": []},
+        {"sample": "s4", "change": "added", "paths": [], "contents": []},
+    ]
+    assert diff_samples(old, old) == []
+
+
+def test_diff_samples_contents(reads_directory):
+    samples = samples_for(reads_directory)
+    fingerprints = sample_fingerprints(samples, checksums=True)
+    reads_directory.join("s2_R2.fastq").write("@read\nACGTACGT\n+\nIIIIIIII\n")
+    # same content, new mtime: not a change when checksums are available
+    os.utime(str(reads_directory.join("s1_R1.fastq")), ns=(1, 1))
+    changes = diff_samples(samples, samples, old_fingerprints=fingerprints)
+    assert changes == [
+        {"sample": "s2", "change": "modified", "paths": [], "contents": ["R2"]}
+    ]
+
+
+def test_diff_samples_placeholder_reads(reads_directory):
+    samples = samples_for(reads_directory)
+    samples["s3"]["R2"] = "none"
+    samples["s3"]["S"] = "null"
+    fingerprints = sample_fingerprints(samples, checksums=True)
+    assert fingerprints["s3"]["R2"] is None
+    assert diff_samples(samples, samples, old_fingerprints=fingerprints) == []
+    manifest_file = str(reads_directory.join("samples.msnk"))
+    write_manifest(samples, manifest_file, stats=True)
+    with Manifest(manifest_file) as old:
+        assert diff_samples(old, samples) == []
+
+
+def test_diff_samples_checksum_only_manifest(reads_directory):
+    manifest_file = str(reads_directory.join("samples.msnk"))
+    samples = samples_for(reads_directory)
+    write_manifest(samples, manifest_file, checksums=True)
+    reads_directory.join("s2_R1.fastq").write("@read\nTTTT\n+\nIIII\n")
+    with Manifest(manifest_file) as old:
+        changes = diff_samples(old, samples)
+    assert changes == [
+        {"sample": "s2", "change": "modified", "paths": [], "contents": ["R1"]}
+    ]
+
+
+def test_diff_manifest_to_samples(reads_directory):
+    manifest_file = str(reads_directory.join("samples.msnk"))
+    write_manifest(samples_for(reads_directory), manifest_file, stats=True)
+    reads_directory.join("s3.fastq").write("@read\nA\n+\nI\n")
+    reads_directory.join("s5.fastq").write("@read\nA\n+\nI\n")
+    changes = diff_manifest_to_samples(manifest_file, str(reads_directory))
+    assert sorted(
+        (c["sample"], c["change"], tuple(c["contents"])) for c in changes
+    ) == [
+        ("s3", "modified", ("R1",)),
+        ("s5", "added", ()),
+    ]
+
+    out_file = str(reads_directory.join("changes.tsv"))
+    write_sample_changes(changes, out_file)
+    with open(out_file, "r") as in_file:
+        assert "s3\tmodified\t.\tR1\n" in in_file.readlines()
@@ -3,6 +3,7 @@ import warnings
 import pytest
 import tempfile
 import shutil
+import gzip
 
 from metasnek.fasta_finder import (
     fastas_from_directory,
@@ -10,6 +11,9 @@ from metasnek.fasta_finder import (
     parse_fastas,
     write_fastas_tsv,
     combine_fastas,
+    fasta_contig_lengths,
+    balance_shards,
+    combine_fastas_sharded,
 )
 
 
@@ -207,3 +211,375 @@ def test_combine_fastas(fasta_files):
         assert content == expected_content
 
     os.remove(temp_file_path)
+
+
+def test_combine_fastas_incremental(fasta_files, tmpdir):
+    out_file = str(tmpdir.join("combined.fasta"))
+    combine_fastas(fasta_files, out_file, incremental=True)
+    assert os.path.isfile(out_file + ".manifest")
+    with open(out_file, "r") as combined_fasta:
+        assert combined_fasta.read() == (
+            ">ref1:seq1\nACGT\n>ref1:seq2\nTGCA\n"
+            ">ref2:seq3\nGGGG\n>ref2:seq4\nCCCC\n"
+        )
+
+    # unchanged inputs leave the output untouched
+    mtime = os.stat(out_file).st_mtime_ns
+    combine_fastas(fasta_files, out_file, incremental=True)
+    assert os.stat(out_file).st_mtime_ns == mtime
+
+    # new genomes are appended
+    fasta_file_3 = tmpdir.join("file3.fasta")
+    fasta_file_3.write(">seq5\nAAAA\n")
+    fasta_files["ref3"] = str(fasta_file_3)
+    combine_fastas(fasta_files, out_file, incremental=True)
+    with open(out_file, "r") as combined_fasta:
+        assert combined_fasta.read().endswith(">ref2:seq4\nCCCC\n>ref3:seq5\nAAAA\n")
+
+    # removed genomes are dropped and later genomes rewritten
+    del fasta_files["ref1"]
+    combine_fastas(fasta_files, out_file, incremental=True)
+    with open(out_file, "r") as combined_fasta:
+        assert combined_fasta.read() == (
+            ">ref2:seq3\nGGGG\n>ref2:seq4\nCCCC\n>ref3:seq5\nAAAA\n"
+        )
+
+
+def test_combine_fastas_incremental_stale_output(fasta_files, tmpdir):
+    out_file = str(tmpdir.join("combined.fasta"))
+    combine_fastas(fasta_files, out_file, incremental=True)
+    with open(out_file, "w") as combined_fasta:
+        combined_fasta.write(">junk\nNNNN\n")
+    combine_fastas(fasta_files, out_file, incremental=True)
+    with open(out_file, "r") as combined_fasta:
+        assert combined_fasta.read().startswith(">ref1:seq1\nACGT\n")
+
+    os.remove(out_file + ".manifest")
+    with open(out_file, "w") as combined_fasta:
+        combined_fasta.write(">junk\nNNNN\n")
+    combine_fastas({}, out_file, incremental=True)
+    assert os.path.getsize(out_file) == 0
+
+
+def test_balance_shards():
+    sizes = {"a": 10, "b": 7, "c": 6, "d": 3, "e": 1}
+    shards = balance_shards(sizes, 2)
+    assert sorted(sum(sizes[i] for i in shard) for shard in shards) == [13, 14]
+    assert sorted(i for shard in shards for i in shard) == list(sizes)
+    with pytest.raises(ValueError):
+        balance_shards(sizes, 0)
+
+
+def test_fasta_contig_lengths(tmpdir):
+    fasta_file = tmpdir.join("file.fasta")
+    fasta_file.write(">seq1 desc\nACGT\nAC\n>seq2\nTG\n")
+    assert fasta_contig_lengths(str(fasta_file)) == {"seq1": 6, "seq2": 2}
+
+
+def test_combine_fastas_sharded(fasta_files, tmpdir):
+    prefix = str(tmpdir.join("shard"))
+    shard_files = combine_fastas_sharded(fasta_files, prefix, 2)
+    contents = []
+    for shard_file in shard_files:
+        with open(shard_file, "r") as shard:
+            contents.append(shard.read())
+    assert sorted(contents) == [
+        ">ref1:seq1\nACGT\n>ref1:seq2\nTGCA\n",
+        ">ref2:seq3\nGGGG\n>ref2:seq4\nCCCC\n",
+    ]
+    with open(prefix + ".manifest.tsv", "r") as manifest:
+        assert len(manifest.readlines()) == 2
+
+
+def test_combine_fastas_sharded_contigs(fasta_files, tmpdir):
+    prefix = str(tmpdir.join("shard"))
+    shard_files = combine_fastas_sharded(fasta_files, prefix, 4, split_contigs=True)
+    contents = []
+    for shard_file in shard_files:
+        with open(shard_file, "r") as shard:
+            contents.append(shard.read())
+    assert sorted(contents) == [
+        ">ref1:seq1\nACGT\n",
+        ">ref1:seq2\nTGCA\n",
+        ">ref2:seq3\nGGGG\n",
+        ">ref2:seq4\nCCCC\n",
+    ]
+
+
+def test_combine_fastas_sharded_contigs_single_pass(fasta_files, tmpdir, monkeypatch):
+    import metasnek.fasta_finder
+
+    opened = []
+    open_sequence_file = metasnek.fasta_finder.open_sequence_file
+
+    def counting_open(filepath, *args, **kwargs):
+        opened.append(filepath)
+        return open_sequence_file(filepath, *args, **kwargs)
+
+    monkeypatch.setattr(metasnek.fasta_finder, "open_sequence_file", counting_open)
+    prefix = str(tmpdir.join("shard"))
+    sizes = {
+        ("ref1", "seq1"): 4,
+        ("ref1", "seq2"): 4,
+        ("ref2", "seq3"): 4,
+        ("ref2", "seq4"): 4,
+    }
+    combine_fastas_sharded(fasta_files, prefix, 4, split_contigs=True, sizes=sizes)
+    assert sorted(opened) == sorted(fasta_files.values())
+
+    # contig lengths from .fai indexes, rather than scanning each genome first
+    for filepath, contig_ids in zip(
+        fasta_files.values(), (("seq1", "seq2"), ("seq3", "seq4"))
+    ):
+        with open(filepath + ".fai", "w") as fai_file:
+            for contig_id in contig_ids:
+                fai_file.write(f"{contig_id}\t4\t0\t4\t5\n")
+    opened.clear()
+    combine_fastas_sharded(fasta_files, prefix, 4, split_contigs=True)
+    assert sorted(opened) == sorted(fasta_files.values())
+
+
+def test_combine_fastas_sharded_contig_sizes(fasta_files, tmpdir):
+    prefix = str(tmpdir.join("shard"))
+    sizes = {
+        ("ref1", "seq1"): 100,
+        ("ref1", "seq2"): 1,
+        ("ref2", "seq3"): 1,
+        ("ref2", "seq4"): 1,
+    }
+    shard_files = combine_fastas_sharded(
+        fasta_files, prefix, 2, split_contigs=True, sizes=sizes
+    )
+    contents = []
+    for shard_file in shard_files:
+        with open(shard_file, "r") as shard:
+            contents.append(shard.read())
+    assert sorted(contents) == [
+        ">ref1:seq1\nACGT\n",
+        ">ref1:seq2\nTGCA\n>ref2:seq3\nGGGG\n>ref2:seq4\nCCCC\n",
+    ]
+    with pytest.raises(ValueError):
+        combine_fastas_sharded(
+            fasta_files, prefix, 2, split_contigs=True, sizes={"ref1": 1, "ref2": 1}
+        )
+    with pytest.raises(ValueError):
+        combine_fastas_sharded(
+            fasta_files, prefix, 2, split_contigs=True, sizes={("ref1", "seq1"): 1}
+        )
+
+
+def test_combine_fastas_compressed(fasta_files, tmpdir):
+    out_file = str(tmpdir.join("combined.fasta.gz"))
+    combine_fastas(fasta_files, out_file, threads=2)
+    with gzip.open(out_file, "rt") as combined_fasta:
+        assert combined_fasta.read() == (
+            ">ref1:seq1\nACGT\n>ref1:seq2\nTGCA\n"
+            ">ref2:seq3\nGGGG\n>ref2:seq4\nCCCC\n"
+        )
+    assert os.path.isfile(out_file + ".gzi")
+    with pytest.raises(ValueError):
+        combine_fastas(fasta_files, out_file, incremental=True)
+
+
+def test_fastas_from_directory_compressed(tmpdir):
+    for file_name in ["genome1.fna.gz", "genome2.fa.zst", "notes.txt.gz"]:
+        tmpdir.join(file_name).write("")
+    assert sorted(fastas_from_directory(str(tmpdir))) == [
+        "genome1.fna.gz",
+        "genome2.fa.zst",
+    ]
+
+
+def test_combine_fastas_compressed_input(fasta_files, tmpdir):
+    gzip_file = str(tmpdir.join("file2.fasta.gz"))
+    with open(fasta_files["ref2"], "rb") as in_fasta, gzip.open(gzip_file, "wb") as out:
+        out.write(in_fasta.read())
+    assert parse_fastas(gzip_file) == {"file2": gzip_file}
+    fasta_files["ref2"] = gzip_file
+
+    out_file = str(tmpdir.join("combined.fasta"))
+    combine_fastas(fasta_files, out_file, decompress_threads=2)
+    with open(out_file, "r") as combined_fasta:
+        assert combined_fasta.read() == (
+            ">ref1:seq1\nACGT\n>ref1:seq2\nTGCA\n"
+            ">ref2:seq3\nGGGG\n>ref2:seq4\nCCCC\n"
+        )
+
+
+def test_combine_fastas_pipelined(tmpdir):
+    fasta_dict = {}
+    for i in range(20):
+        fasta_file = tmpdir.join(f"genome{i}.fasta")
+        fasta_file.write("".join(f">seq{j}\n{'ACGT' * (i + j)}\n" for j in range(50)))
+        fasta_dict[f"ref{i}"] = str(fasta_file)
+
+    expected_file = str(tmpdir.join("expected.fasta"))
+    pipelined_file = str(tmpdir.join("pipelined.fasta"))
+    combine_fastas(fasta_dict, expected_file)
+    combine_fastas(fasta_dict, pipelined_file, read_threads=4, max_buffer_bytes=100)
+
+    with open(expected_file, "rb") as expected, open(pipelined_file, "rb") as pipelined:
+        assert pipelined.read() == expected.read()
+
+
+def test_pipelined_fasta_chunks_buffer_cap(tmpdir, monkeypatch):
+    import time
+    import queue
+    import threading
+    import metasnek.fasta_finder
+
+    fasta_dict = {}
+    for i in range(8):
+        fasta_file = tmpdir.join(f"genome{i}.fasta")
+        fasta_file.write("".join(f">seq{j}\n{'ACGT' * 10}\n" for j in range(100)))
+        fasta_dict[f"ref{i}"] = str(fasta_file)
+
+    lock = threading.Lock()
+    buffered = {"now": 0, "peak": 0, "largest": 0}
+
+    class TrackingQueue(queue.Queue):
+        def put(self, item, *args, **kwargs):
+            if isinstance(item, str):
+                with lock:
+                    buffered["now"] += len(item)
+                    buffered["peak"] = max(buffered["peak"], buffered["now"])
+                    buffered["largest"] = max(buffered["largest"], len(item))
+            super().put(item, *args, **kwargs)
+
+        def get(self, *args, **kwargs):
+            item = super().get(*args, **kwargs)
+            if isinstance(item, str):
+                with lock:
+                    buffered["now"] -= len(item)
+            return item
+
+    monkeypatch.setattr(metasnek.fasta_finder.queue, "Queue", TrackingQueue)
+    chunks = []
+    for chunk in metasnek.fasta_finder._pipelined_fasta_chunks(
+        fasta_dict, 4, 500, chunk_size=100
+    ):
+        time.sleep(0.001)
+        chunks.append(chunk)
+
+    assert len("".join(chunks)) == sum(
+        os.path.getsize(f) for f in fasta_dict.values()
+    ) + 8 * 100 * len("ref0:")
+    assert buffered["peak"] <= 500 + buffered["largest"]
+
+
+def test_combine_fastas_pipelined_missing_file(fasta_files, tmpdir):
+    fasta_files["ref3"] = str(tmpdir.join("missing.fasta"))
+    with pytest.raises(FileNotFoundError):
+        combine_fastas(fasta_files, str(tmpdir.join("out.fasta")), read_threads=2)
+
+
+def test_combine_fastas_compressed_missing_file(fasta_files, tmpdir):
+    from metasnek.sniff import sniff_file
+
+    fasta_files["ref3"] = str(tmpdir.join("missing.fasta"))
+    out_file = str(tmpdir.join("out.fasta.gz"))
+    with pytest.raises(FileNotFoundError):
+        combine_fastas(fasta_files, out_file)
+    assert not os.path.exists(out_file + ".gzi")
+    assert sniff_file(out_file)["problems"]
+
+
+def test_fastas_from_directory_sniff(dir_test_files):
+    with open(os.path.join(dir_test_files, "sequence.fasta"), "w") as out:
+        out.write(">seq1\nACGT\n")
+    with pytest.warns(Warning):
+        fasta_files = fastas_from_directory(dir_test_files, sniff="drop")
+    assert fasta_files == {
+        "sequence.fasta": os.path.join(dir_test_files, "sequence.fasta")
+    }
+
+
+@pytest.fixture
+def contig_fastas(tmpdir):
+    fasta_file_1 = tmpdir.join("genome1.fasta")
+    fasta_file_2 = tmpdir.join("genome2.fasta")
+    fasta_file_1.write(">short desc\nACG\n>long some description\nACGTAC\nGTACGT\n")
+    fasta_file_2.write(">mid\nACGTACGT\n")
+    return {"ref1": str(fasta_file_1), "ref2": str(fasta_file_2)}
+
+
+@pytest.mark.parametrize("read_threads", [1, 2])
+def test_combine_fastas_filters(contig_fastas, tmpdir, read_threads):
+    out_file = str(tmpdir.join("combined.fasta"))
+    name_map_file = str(tmpdir.join("names.tsv"))
+    combine_fastas(
+        contig_fastas,
+        out_file,
+        read_threads=read_threads,
+        min_length=4,
+        max_length=10,
+        first_token=True,
+        rename={"ref2:mid": "ref2_contig1"},
+        line_width=5,
+        name_map_file=name_map_file,
+    )
+    with open(out_file, "r") as combined_fasta:
+        assert combined_fasta.read() == ">ref2_contig1\nACGTA\nCGT\n"
+    with open(name_map_file, "r") as names:
+        assert names.read() == "ref2:mid\tref2_contig1\n"
+
+
+def test_combine_fastas_filters_keep_descriptions(contig_fastas, tmpdir):
+    out_file = str(tmpdir.join("combined.fasta"))
+    combine_fastas(contig_fastas, out_file, min_length=4, line_width=0)
+    with open(out_file, "r") as combined_fasta:
+        assert combined_fasta.read() == (
+            ">ref1:long some description\nACGTACGTACGT\n>ref2:mid\nACGTACGT\n"
+        )
+
+
+def test_combine_fastas_name_map_only(contig_fastas, tmpdir):
+    expected_file = str(tmpdir.join("expected.fasta"))
+    out_file = str(tmpdir.join("combined.fasta"))
+    name_map_file = str(tmpdir.join("names.tsv"))
+    combine_fastas(contig_fastas, expected_file)
+    combine_fastas(contig_fastas, out_file, name_map_file=name_map_file)
+    with open(expected_file, "r") as expected, open(out_file, "r") as combined:
+        assert combined.read() == expected.read()
+    with open(name_map_file, "r") as names:
+        assert len(names.readlines()) == 3
+    with pytest.raises(ValueError):
+        combine_fastas(contig_fastas, out_file, incremental=True, min_length=4)
+
+
+def test_filter_fasta_lines_streams():
+    from metasnek.fasta_finder import _filter_fasta_lines
+
+    consumed = []
+
+    def contig(n_lines):
+        yield ">seq1\n"
+        for i in range(n_lines):
+            consumed.append(i)
+            yield "ACGTACG\n"
+
+    lines = _filter_fasta_lines("ref1", contig(1000), line_width=5)
+    assert [next(lines), next(lines)] == [">ref1:seq1\n", "ACGTA\n"]
+    assert len(consumed) == 1
+    assert "".join(lines).replace("\n", "") == "CG" + "ACGTACG" * 999
+
+    consumed.clear()
+    lines = _filter_fasta_lines("ref1", contig(1000), min_length=20, line_width=0)
+    assert [next(lines), next(lines)] == [">ref1:seq1\n", "ACGTACG"]
+    assert len(consumed) == 3
+
+
+def test_combine_fastas_filters_keep_header_whitespace(tmpdir):
+    fasta_file = tmpdir.join("genome.fasta")
+    fasta_file.write(">seq1\tdesc  two\nACGT\n>seq2\nACGT\n")
+    fasta_dict = {"ref1": str(fasta_file)}
+    out_file = str(tmpdir.join("combined.fasta"))
+    name_map_file = str(tmpdir.join("names.tsv"))
+    combine_fastas(fasta_dict, out_file, name_map_file=name_map_file)
+    with open(out_file, "r") as combined:
+        assert combined.read() == ">ref1:seq1\tdesc  two\nACGT\n>ref1:seq2\nACGT\n"
+    with open(name_map_file, "r") as names:
+        assert names.read() == "ref1:seq1\tref1:seq1\nref1:seq2\tref1:seq2\n"
+    combine_fastas(fasta_dict, out_file, rename={"ref1:seq1": "contig1"})
+    with open(out_file, "r") as combined:
+        assert combined.read() == ">contig1\tdesc  two\nACGT\n>ref1:seq2\nACGT\n"
@@ -362,3 +362,23 @@ def test_write_samples_tsv(temp_directory):
     )
 
     assert content == expected_content
+
+
+def test_parse_directory_sniff(tmpdir):
+    for file_name in ["good_R1.fastq", "good_R2.fastq"]:
+        tmpdir.join(file_name).write("@r1\nACGT\n+\nIIII\n")
+    tmpdir.join("empty.fastq").write("")
+    file_list = [str(f) for f in tmpdir.listdir()]
+    with pytest.warns(Warning, match="empty file"):
+        paired, unpaired = parse_directory(file_list, sniff="drop")
+    assert len(paired) == 1
+    assert unpaired == set()
+
+
+def test_parse_samples_to_dictionary_sniff(tmpdir):
+    for file_name in ["good_R1.fastq", "good_R2.fastq"]:
+        tmpdir.join(file_name).write("@r1\nACGT\n+\nIIII\n")
+    tmpdir.join("empty.fastq").write("")
+    with pytest.warns(Warning, match="empty file"):
+        samples = parse_samples_to_dictionary(str(tmpdir), sniff="drop")
+    assert list(samples) == ["good"]
@@ -0,0 +1,108 @@
+import os
+import pytest
+
+from metasnek.manifest import (
+    file_checksum,
+    write_manifest,
+    load_manifest,
+    tsv_to_manifest,
+    manifest_to_tsv,
+)
+
+
+@pytest.fixture
+def samples_dictionary(tmpdir):
+    files = {}
+    for file_name in [
+        "s1_R1.fastq",
+        "s1_R2.fastq",
+        "s1_RS.fastq",
+        "s2_R1.fastq",
+        "s3.fastq",
+    ]:
+        tmpdir.join(file_name).write(file_name)
+        files[file_name] = str(tmpdir.join(file_name))
+    return {
+        "s3": {"R1": files["s3.fastq"], "R2": None, "S": None},
+        "s1": {
+            "R1": files["s1_R1.fastq"],
+            "R2": files["s1_R2.fastq"],
+            "S": files["s1_RS.fastq"],
+        },
+        "s2": {"R1": files["s2_R1.fastq"], "R2": None, "S": None},
+    }
+
+
+def test_manifest_samples_roundtrip(samples_dictionary, tmpdir):
+    manifest_file = str(tmpdir.join("samples.msnk"))
+    write_manifest(samples_dictionary, manifest_file)
+    with load_manifest(manifest_file) as manifest:
+        assert len(manifest) == 3
+        assert manifest["s1"] == samples_dictionary["s1"]
+        assert "s2" in manifest
+        assert "s4" not in manifest
+        assert manifest.get("s4") is None
+        with pytest.raises(KeyError):
+            manifest["s4"]
+        assert list(manifest.keys()) == ["s3", "s1", "s2"]
+        assert manifest.to_dictionary() == samples_dictionary
+        assert manifest.fingerprints("s3")[0]["size"] is None
+
+
+def test_manifest_fingerprints(samples_dictionary, tmpdir):
+    manifest_file = str(tmpdir.join("samples.msnk"))
+    write_manifest(samples_dictionary, manifest_file, stats=True, checksums=True)
+    with load_manifest(manifest_file) as manifest:
+        fingerprints = manifest.fingerprints("s2")
+    r1_file = samples_dictionary["s2"]["R1"]
+    assert fingerprints[0] == {
+        "path": r1_file,
+        "size": os.path.getsize(r1_file),
+        "mtime": os.stat(r1_file).st_mtime_ns,
+        "checksum": file_checksum(r1_file),
+    }
+    assert fingerprints[1]["path"] is None
+
+
+def test_manifest_placeholder_reads(samples_dictionary, tmpdir):
+    samples_dictionary["s2"]["R2"] = "none"
+    samples_dictionary["s3"]["S"] = "NULL"
+    manifest_file = str(tmpdir.join("samples.msnk"))
+    write_manifest(samples_dictionary, manifest_file, stats=True, checksums=True)
+    with load_manifest(manifest_file) as manifest:
+        assert manifest["s2"]["R2"] == "none"
+        assert manifest.fingerprints("s2")[1]["checksum"] == 0
+
+
+def test_manifest_fastas(tmpdir):
+    fasta_dict = {"ref2": "b.fasta", "ref1": "a.fasta"}
+    manifest_file = str(tmpdir.join("fastas.msnk"))
+    write_manifest(fasta_dict, manifest_file)
+    with load_manifest(manifest_file) as manifest:
+        assert manifest["ref1"] == "a.fasta"
+        assert manifest.to_dictionary() == fasta_dict
+
+    tsv_file = str(tmpdir.join("fastas.tsv"))
+    manifest_to_tsv(manifest_file, tsv_file)
+    with open(tsv_file, "r") as in_tsv:
+        assert in_tsv.read() == "ref2\tb.fasta\nref1\ta.fasta\n"
+
+
+def test_manifest_tsv_roundtrip(samples_dictionary, tmpdir):
+    tsv_file = str(tmpdir.join("samples.tsv"))
+    manifest_file = str(tmpdir.join("samples.msnk"))
+    out_tsv_file = str(tmpdir.join("out.tsv"))
+    with open(tsv_file, "w") as out:
+        for name, reads in samples_dictionary.items():
+            out.write("\t".join([name] + [r for r in reads.values() if r]) + "\n")
+    tsv_to_manifest(tsv_file, manifest_file, stats=True)
+    manifest_to_tsv(manifest_file, out_tsv_file)
+    with open(tsv_file, "r") as in_tsv, open(out_tsv_file, "r") as out_tsv:
+        assert sorted(in_tsv.readlines()) == sorted(out_tsv.readlines())
+
+
+def test_manifest_invalid(tmpdir):
+    bad_file = tmpdir.join("bad.msnk")
+    bad_file.write("not a manifest, just some text that is long enough")
+    with pytest.raises(ValueError):
+        load_manifest(str(bad_file))
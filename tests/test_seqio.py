@@ -0,0 +1,93 @@
+import os
+import gzip
+import pytest
+
+from metasnek.bgzf import BgzfWriter
+from metasnek.seqio import (
+    strip_compression_extension,
+    detect_compression,
+    open_sequence_file,
+    prefetch_sequence_files,
+    iter_records,
+)
+
+
+FASTA_CONTENT = "".join(f">seq{i}\nACGTACGT\n" for i in range(5000))
+
+
+@pytest.fixture
+def sequence_files(tmpdir):
+    plain_file = str(tmpdir.join("plain.fasta"))
+    gzip_file = str(tmpdir.join("gzipped.fasta.gz"))
+    bgzf_file = str(tmpdir.join("bgzipped.fasta.gz"))
+    with open(plain_file, "w") as out:
+        out.write(FASTA_CONTENT)
+    with gzip.open(gzip_file, "wt") as out:
+        out.write(FASTA_CONTENT)
+    with BgzfWriter(bgzf_file) as out:
+        out.write(FASTA_CONTENT)
+    return {"plain": plain_file, "gzip": gzip_file, "bgzf": bgzf_file}
+
+
+def test_strip_compression_extension():
+    assert strip_compression_extension("genome.fna.gz") == "genome.fna"
+    assert strip_compression_extension("genome.fa.ZST") == "genome.fa"
+    assert strip_compression_extension("genome.fasta") == "genome.fasta"
+
+
+def test_detect_compression(sequence_files):
+    assert detect_compression(sequence_files["plain"]) is None
+    assert detect_compression(sequence_files["gzip"]) == "gzip"
+    assert detect_compression(sequence_files["bgzf"]) == "bgzf"
+
+
+def test_open_sequence_file(sequence_files):
+    for filepath in sequence_files.values():
+        with open_sequence_file(filepath, chunk_size=4096, max_chunks=2) as in_file:
+            assert in_file.read() == FASTA_CONTENT
+
+
+def test_open_sequence_file_early_close(sequence_files):
+    in_file = open_sequence_file(sequence_files["gzip"], chunk_size=1024, max_chunks=1)
+    assert in_file.readline() == ">seq0\n"
+    in_file.close()
+
+
+def test_open_sequence_file_truncated(tmpdir, sequence_files):
+    truncated_file = str(tmpdir.join("truncated.fasta.gz"))
+    with open(sequence_files["gzip"], "rb") as in_file:
+        content = in_file.read()
+    with open(truncated_file, "wb") as out:
+        out.write(content[: len(content) // 2])
+    with pytest.raises(EOFError):
+        with open_sequence_file(truncated_file) as in_file:
+            in_file.read()
+
+
+def test_prefetch_sequence_files(sequence_files):
+    filepaths = list(sequence_files.values())
+    contents = []
+    for in_file in prefetch_sequence_files(filepaths, parallel=3):
+        with in_file:
+            contents.append(in_file.read())
+    assert contents == [FASTA_CONTENT] * 3
+
+
+def test_iter_records(tmpdir):
+    fastq_file = tmpdir.join("reads.fastq")
+    fastq_file.write("@r1\nACGT\n+\nIIII\n@r2\nTT\n+\nII\n")
+    fasta_file = tmpdir.join("genome.fasta")
+    fasta_file.write(">c1\nAC\nGT\n>c2\nTT\n")
+    truncated_file = tmpdir.join("truncated.fastq")
+    truncated_file.write("@r1\nACGT\n+\nIIII\n@r2\nTT\n")
+
+    with open_sequence_file(str(fastq_file)) as in_file:
+        assert list(iter_records(in_file)) == [
+            "@r1\nACGT\n+\nIIII\n",
+            "@r2\nTT\n+\nII\n",
+        ]
+    with open_sequence_file(str(fasta_file)) as in_file:
+        assert list(iter_records(in_file)) == [">c1\nAC\nGT\n", ">c2\nTT\n"]
+    with open_sequence_file(str(truncated_file)) as in_file:
+        with pytest.raises(ValueError):
+            list(iter_records(in_file))
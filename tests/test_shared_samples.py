@@ -0,0 +1,52 @@
+import pickle
+import pytest
+import concurrent.futures
+
+from metasnek.shared_samples import (
+    publish_samples,
+    attach_samples,
+    attached_samples,
+)
+
+
+@pytest.fixture
+def samples():
+    return {
+        f"sample{i}": {
+            "R1": f"/reads/sample{i}_R1.fastq.gz",
+            "R2": f"/reads/sample{i}_R2.fastq.gz" if i % 2 else None,
+            "S": None,
+        }
+        for i in range(1000)
+    }
+
+
+def lookup(name, sample):
+    return attached_samples(name)[sample]
+
+
+def test_publish_and_attach(samples):
+    table = publish_samples(samples)
+    try:
+        attached = attach_samples(table.name)
+        assert len(attached) == 1000
+        assert attached["sample7"] == samples["sample7"]
+        assert "sample1000" not in attached
+        assert attached.to_dictionary() == samples
+        attached.close()
+        attached.close()
+    finally:
+        table.close()
+    with pytest.raises(FileNotFoundError):
+        attach_samples(table.name)
+
+
+def test_shared_samples_workers(samples):
+    with publish_samples(samples) as table:
+        names = ["sample0", "sample1", "sample999"]
+        with concurrent.futures.ProcessPoolExecutor(max_workers=2) as executor:
+            results = list(executor.map(lookup, [table.name] * len(names), names))
+        assert results == [samples[name] for name in names]
+        # tasks only carry the block name, however many samples there are
+        assert len(pickle.dumps((table.name, "sample0"))) < 100
+        assert table["sample999"] == samples["sample999"]
@@ -0,0 +1,153 @@
+import os
+import gzip
+import random
+import pytest
+
+from metasnek.sketch import (
+    sketch_file,
+    merge_sketches,
+    sketch_files,
+    sketch_samples,
+    sketch_fastas,
+    jaccard,
+    containment,
+    compare_sketches,
+    write_similarity_matrix,
+)
+
+
+def reverse_complement(sequence):
+    return sequence[::-1].translate(str.maketrans("ACGT", "TGCA"))
+
+
+@pytest.fixture
+def genome():
+    rng = random.Random(1)
+    return "".join(rng.choice("ACGT") for _ in range(5000))
+
+
+@pytest.fixture
+def sequence_files(tmpdir, genome):
+    fasta_file = tmpdir.join("genome.fasta")
+    fasta_file.write(f">contig1\n{genome[:2500]}\n>contig2\n{genome[2500:]}\n")
+    rc_file = tmpdir.join("genome_rc.fasta")
+    rc_file.write(
+        f">contig1\n{reverse_complement(genome[:2500])}\n>contig2\n{genome[2500:]}\n"
+    )
+    fastq_file = str(tmpdir.join("reads_R1.fastq.gz"))
+    with gzip.open(fastq_file, "wt") as out:
+        for i in range(0, 2000, 100):
+            read = genome[i : i + 150]
+            out.write(f"@read{i}\n{read}\n+\n{'I' * len(read)}\n")
+    return {"fasta": str(fasta_file), "rc": str(rc_file), "fastq": fastq_file}
+
+
+def test_sketch_file_canonical(sequence_files):
+    sketch = sketch_file(sequence_files["fasta"], k=15, sketch_size=200)
+    assert len(sketch) == 200
+    assert sketch == sorted(sketch)
+    assert sketch_file(sequence_files["rc"], k=15, sketch_size=200) == sketch
+
+
+def test_sketch_file_invalid_k(sequence_files):
+    with pytest.raises(ValueError):
+        sketch_file(sequence_files["fasta"], k=33)
+
+
+def test_sketch_file_skips_ambiguous(tmpdir):
+    fasta_file = tmpdir.join("n.fasta")
+    fasta_file.write(">contig\nACGNACG\n")
+    assert sketch_file(str(fasta_file), k=4) == []
+
+
+def test_add_hashes_numpy_matches_python(monkeypatch):
+    pytest.importorskip("numpy")
+    import metasnek.sketch
+
+    monkeypatch.setattr(metasnek.sketch, "NUMPY_BLOCK_SIZE", 300)
+    rng = random.Random(2)
+    sequences = [
+        "".join(rng.choice("ACGTacgtN") for _ in range(length)).encode()
+        for length in (0, 3, 40, 1000, 2500)
+    ]
+    for k in (1, 5, 21, 32):
+        for sketch_size in (10, 5000):
+            sketches = []
+            for add_hashes in (
+                metasnek.sketch._add_hashes_python,
+                metasnek.sketch._add_hashes_numpy,
+            ):
+                heap = []
+                seen = set()
+                for sequence in sequences:
+                    add_hashes(sequence, k, 42, sketch_size, heap, seen)
+                sketches.append(sorted(-h for h in heap))
+            assert sketches[0] == sketches[1]
+
+
+def test_sketch_file_pieces(genome, tmpdir, monkeypatch):
+    import metasnek.sketch
+
+    fasta_file = str(tmpdir.join("wrapped.fasta"))
+    with open(fasta_file, "w") as out:
+        for contig in (genome[:2500], genome[2500:3000] + "N" + genome[3000:]):
+            out.write(">contig\n")
+            for start in range(0, len(contig), 60):
+                out.write(contig[start : start + 60] + "\n")
+    for k in (1, 15, 32):
+        sketch = sketch_file(fasta_file, k=k, sketch_size=5000)
+        monkeypatch.setattr(metasnek.sketch, "SEQUENCE_PIECE_SIZE", 7)
+        assert sketch_file(fasta_file, k=k, sketch_size=5000) == sketch
+        monkeypatch.undo()
+
+
+def test_merge_sketches():
+    assert merge_sketches([[1, 5, 9], [2, 5, 7]], sketch_size=4) == [1, 2, 5, 7]
+
+
+def test_similarity(sequence_files):
+    sketches = sketch_files(sequence_files.values(), k=15, sketch_size=200, processes=1)
+    fasta_sketch = sketches[sequence_files["fasta"]]
+    fastq_sketch = sketches[sequence_files["fastq"]]
+    assert jaccard(fasta_sketch, fasta_sketch, 200) == 1.0
+    assert 0.2 < jaccard(fasta_sketch, fastq_sketch, 200) < 0.6
+    assert containment(fastq_sketch, fasta_sketch) == 1.0
+
+
+def test_sketch_files_process_pool_and_cache(sequence_files, tmpdir):
+    cache_dir = str(tmpdir.join("cache"))
+    filepaths = [sequence_files["fasta"], sequence_files["fastq"]]
+    sketches = sketch_files(
+        filepaths, k=15, sketch_size=50, processes=2, cache_dir=cache_dir
+    )
+    assert len(os.listdir(cache_dir)) == 2
+    cached = sketch_files(
+        filepaths, k=15, sketch_size=50, processes=1, cache_dir=cache_dir
+    )
+    assert cached == sketches
+
+
+def test_sketch_samples_and_matrix(sequence_files, tmpdir):
+    samples = {
+        "sample1": {"R1": sequence_files["fastq"], "R2": "none", "S": None},
+        "sample2": {
+            "R1": sequence_files["fasta"],
+            "R2": sequence_files["rc"],
+            "S": "null",
+        },
+    }
+    sample_sketches = sketch_samples(samples, k=15, sketch_size=100, processes=1)
+    genome_sketches = sketch_fastas(
+        {"ref1": sequence_files["fasta"]}, k=15, sketch_size=100, processes=1
+    )
+    assert sample_sketches["sample2"] == genome_sketches["ref1"]
+
+    names, matrix = compare_sketches(sample_sketches, sketch_size=100)
+    assert names == ["sample1", "sample2"]
+    assert matrix[0][0] == matrix[1][1] == 1.0
+    assert matrix[0][1] == matrix[1][0]
+
+    out_file = str(tmpdir.join("matrix.tsv"))
+    write_similarity_matrix(names, matrix, out_file)
+    with open(out_file, "r") as in_file:
+        assert in_file.readline() == "\tsample1\tsample2\n"
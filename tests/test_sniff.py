@@ -0,0 +1,111 @@
+import os
+import gzip
+import json
+import pytest
+
+from metasnek.bgzf import BgzfWriter
+from metasnek.sniff import sniff_file, sniff_files, filter_sniffed
+
+
+FASTQ = "@r1\nACGT\n+\nIIII\n@r2\nACGT\n+\n#III\n"
+FASTA = ">c1\nACGT\n"
+
+
+@pytest.fixture
+def sequence_files(tmpdir):
+    files = {}
+
+    def add(name, content, mode="w"):
+        filepath = str(tmpdir.join(name))
+        with open(filepath, mode) as out:
+            out.write(content)
+        files[name] = filepath
+
+    add("good.fastq", FASTQ)
+    add("good.fasta", FASTA)
+    add("empty.fasta", "")
+    add("reads.fasta", FASTQ)
+    add("windows.fastq", FASTQ.replace("\n", "\r\n"))
+    add("no_newline.fasta", FASTA.strip())
+    add("phred64.fastq", "@r1\nACGT\n+\nhhhh\n")
+    add("bad.fastq", "@r1\nACGT\n+\nIII\n")
+    add("bad.gz", b"\x1f\x8bnot really gzip data", "wb")
+    files["good.fastq.gz"] = str(tmpdir.join("good.fastq.gz"))
+    with gzip.open(files["good.fastq.gz"], "wt") as out:
+        out.write(FASTQ)
+    files["good.fasta.gz"] = str(tmpdir.join("good.fasta.gz"))
+    with BgzfWriter(files["good.fasta.gz"], index=False) as out:
+        out.write(FASTA)
+    with open(files["good.fasta.gz"], "rb") as in_file:
+        add("truncated.fasta.gz", in_file.read()[:-28], "wb")
+    with gzip.open(str(tmpdir.join("large.fastq.gz")), "wt") as out:
+        out.write(FASTQ * 1000)
+    with open(str(tmpdir.join("large.fastq.gz")), "rb") as in_file:
+        data = in_file.read()
+    add("truncated.fastq.gz", data[: len(data) // 2], "wb")
+    return files
+
+
+def test_sniff_file_good(sequence_files):
+    result = sniff_file(sequence_files["good.fastq"])
+    assert result["format"] == "fastq"
+    assert result["quality_encoding"] == "phred33"
+    assert result["problems"] == []
+    assert sniff_file(sequence_files["good.fasta"])["format"] == "fasta"
+    assert sniff_file(sequence_files["good.fastq.gz"])["compression"] == "gzip"
+    bgzf_result = sniff_file(sequence_files["good.fasta.gz"])
+    assert bgzf_result["compression"] == "bgzf"
+    assert bgzf_result["format"] == "fasta"
+    assert bgzf_result["problems"] == []
+    assert sniff_file(sequence_files["phred64.fastq"])["quality_encoding"] == "phred64"
+
+
+@pytest.mark.parametrize(
+    "name,problem",
+    [
+        ("empty.fasta", "empty file"),
+        ("reads.fasta", "fastq content in a fasta-named file"),
+        ("windows.fastq", "Windows (CRLF) line endings"),
+        ("no_newline.fasta", "no final newline, file may be truncated"),
+        ("bad.fastq", "sequence and quality lengths differ at line 1"),
+        ("bad.gz", "corrupt gzip data"),
+        ("truncated.fasta.gz", "missing BGZF EOF block, file may be truncated"),
+    ],
+)
+def test_sniff_file_problems(sequence_files, name, problem):
+    assert problem in sniff_file(sequence_files[name])["problems"]
+
+
+def test_sniff_file_verify_gzip(sequence_files):
+    result = sniff_file(sequence_files["truncated.fastq.gz"])
+    assert result["problems"] == []
+    assert result["notes"] == ["gzip truncation not checked"]
+    result = sniff_file(sequence_files["truncated.fastq.gz"], verify_gzip=True)
+    assert result["problems"] == ["incomplete or corrupt gzip stream"]
+    assert result["notes"] == []
+    for name in ("good.fastq.gz", "good.fasta.gz"):
+        assert sniff_file(sequence_files[name], verify_gzip=True)["problems"] == []
+
+    filepaths = [sequence_files["good.fastq.gz"], sequence_files["truncated.fastq.gz"]]
+    assert filter_sniffed(filepaths, "drop") == filepaths
+    with pytest.warns(Warning, match="Dropping"):
+        assert filter_sniffed(filepaths, "drop", verify_gzip=True) == filepaths[:1]
+
+
+def test_sniff_files_cache(sequence_files, tmpdir):
+    cache_file = str(tmpdir.join("sniff.json"))
+    results = sniff_files(sequence_files.values(), threads=4, cache_file=cache_file)
+    assert set(results) == set(sequence_files.values())
+    with open(cache_file, "r") as in_cache:
+        assert len(json.load(in_cache)) == len(sequence_files)
+    assert sniff_files(sequence_files.values(), cache_file=cache_file) == results
+
+
+def test_filter_sniffed(sequence_files):
+    filepaths = [sequence_files["good.fastq"], sequence_files["empty.fasta"]]
+    with pytest.warns(Warning, match="Dropping"):
+        assert filter_sniffed(filepaths, "drop") == [sequence_files["good.fastq"]]
+    with pytest.warns(Warning, match="Problem with"):
+        assert filter_sniffed(filepaths, "flag") == filepaths
+    with pytest.raises(ValueError):
+        filter_sniffed(filepaths, "delete")
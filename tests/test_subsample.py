@@ -0,0 +1,103 @@
+import os
+import gzip
+import pytest
+
+from metasnek.subsample import subsample_reads, subsample_samples
+
+
+def write_fastq(filepath, n_reads, tag):
+    with open(filepath, "w") as out:
+        for i in range(n_reads):
+            out.write(f"@read{i}/{tag}\nACGT\n+\nIIII\n")
+
+
+def read_names(filepath, opener=open):
+    with opener(filepath, "rt") as in_file:
+        return [line.strip().split("/")[0] for line in in_file if line.startswith("@")]
+
+
+@pytest.fixture
+def samples(tmpdir):
+    reads_dir = tmpdir.mkdir("reads")
+    write_fastq(str(reads_dir.join("s1_R1.fastq")), 200, 1)
+    write_fastq(str(reads_dir.join("s1_R2.fastq")), 200, 2)
+    write_fastq(str(reads_dir.join("s1_RS.fastq")), 50, "S")
+    write_fastq(str(reads_dir.join("s2.fastq")), 30, 1)
+    return {
+        "s1": {
+            "R1": str(reads_dir.join("s1_R1.fastq")),
+            "R2": str(reads_dir.join("s1_R2.fastq")),
+            "S": str(reads_dir.join("s1_RS.fastq")),
+        },
+        "s2": {"R1": str(reads_dir.join("s2.fastq")), "R2": None, "S": None},
+    }
+
+
+def test_subsample_reads_fraction(samples, tmpdir):
+    out_files = [str(tmpdir.join("out_R1.fastq")), str(tmpdir.join("out_R2.fastq"))]
+    in_files = [samples["s1"]["R1"], samples["s1"]["R2"]]
+    kept = subsample_reads(in_files, out_files, fraction=0.25, seed=1)
+    assert 20 < kept < 80
+    assert read_names(out_files[0]) == read_names(out_files[1])
+    assert len(read_names(out_files[0])) == kept
+
+    again = [str(tmpdir.join("again_R1.fastq")), str(tmpdir.join("again_R2.fastq"))]
+    subsample_reads(in_files, again, fraction=0.25, seed=1)
+    assert read_names(again[0]) == read_names(out_files[0])
+
+
+def test_subsample_reads_count(samples, tmpdir):
+    out_files = [str(tmpdir.join("out_R1.fastq")), str(tmpdir.join("out_R2.fastq"))]
+    in_files = [samples["s1"]["R1"], samples["s1"]["R2"]]
+    assert subsample_reads(in_files, out_files, count=17) == 17
+    names = read_names(out_files[0])
+    assert names == read_names(out_files[1])
+    assert len(set(names)) == 17
+
+    assert subsample_reads([samples["s2"]["R1"]], out_files[:1], count=100) == 30
+
+
+def test_subsample_reads_invalid(samples, tmpdir):
+    out_files = [str(tmpdir.join("out_R1.fastq")), str(tmpdir.join("out_R2.fastq"))]
+    with pytest.raises(ValueError):
+        subsample_reads([samples["s1"]["R1"]], out_files[:1])
+    with pytest.raises(ValueError):
+        subsample_reads([samples["s1"]["R1"]], out_files[:1], fraction=0.5, count=5)
+    with pytest.raises(ValueError):
+        subsample_reads(
+            [samples["s1"]["R1"], samples["s1"]["S"]], out_files, fraction=0.5
+        )
+
+
+def test_subsample_samples(samples, tmpdir):
+    output_dir = str(tmpdir.join("subsampled"))
+    subsampled = subsample_samples(
+        samples, output_dir, count=10, processes=2, compress=True
+    )
+    assert subsampled["s1"]["R1"] == os.path.join(output_dir, "s1_R1.fastq.gz")
+    assert subsampled["s2"]["R2"] is None
+    r1_names = read_names(subsampled["s1"]["R1"], gzip.open)
+    assert len(r1_names) == 10
+    assert r1_names == read_names(subsampled["s1"]["R2"], gzip.open)
+    assert len(read_names(subsampled["s1"]["S"], gzip.open)) == 10
+    assert len(read_names(subsampled["s2"]["R1"], gzip.open)) == 10
+
+
+def test_subsample_samples_output_paths(samples, tmpdir):
+    reads_dir = os.path.dirname(samples["s1"]["R1"])
+    with pytest.raises(ValueError, match="would overwrite input file"):
+        subsample_samples({"s1": samples["s1"]}, reads_dir, count=10, processes=1)
+    with open(samples["s1"]["R1"], "r") as in_file:
+        assert len(in_file.readlines()) == 800
+
+    for run in ("run1", "run2"):
+        tmpdir.mkdir(run)
+        write_fastq(str(tmpdir.join(run, "reads.fastq")), 20, 1)
+    same_names = {
+        run: {"R1": str(tmpdir.join(run, "reads.fastq")), "R2": None, "S": None}
+        for run in ("run1", "run2")
+    }
+    output_dir = str(tmpdir.join("subsampled"))
+    subsampled = subsample_samples(same_names, output_dir, count=5, processes=1)
+    assert subsampled["run1"]["R1"] == os.path.join(output_dir, "run1_R1.fastq")
+    assert subsampled["run2"]["R1"] == os.path.join(output_dir, "run2_R1.fastq")